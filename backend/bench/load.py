@@ -0,0 +1,488 @@
+"""Load test: the HTTP API end to end under concurrency, offline
+
+Starts the backend in a WSGI server for each worker x thread configuration
+and drives /api/generate-flyer and /api/companies with concurrent clients.
+The logo API is a local stand-in that answers with configurable latency,
+404s for a share of domains and timeouts (a response held past the logo
+deadline). Fonts are bundled, so nothing else should leave the machine:
+the server runs with its HTTP(S) proxy pointed at the stand-in, which
+refuses and counts any request for another host.
+
+For each configuration it reports throughput, p50/p95/p99 latency per
+endpoint, the error rate and the peak RSS and PSS of every server process.
+PSS splits pages shared between processes among them, so it shows what a
+worker really adds.
+
+The server runs the production entry point (wsgi.py) under gunicorn with
+gunicorn.conf.py when gunicorn is installed, otherwise a pre-forking
+Werkzeug server with a pool of threads per worker; both import the app in
+the master before forking.
+
+Usage (from backend/):
+    python bench/load.py [--configs 1x4,2x2] [--concurrency 8] [--duration 20]
+                         [--logo-latency 0.08] [--logo-404 0.2] [--logo-timeouts 0.02]
+                         [--output results.json] [--baseline baseline.json]
+
+With --baseline, exits non-zero when a configuration's throughput dropped
+or its p95 grew by more than the tolerance.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from pipeline import BACKEND, synthetic_photo, summarize
+
+ENDPOINTS = ('generate', 'companies', 'search')
+# Relative change allowed against --baseline
+TOLERANCE = 0.25
+
+
+class LogoStub:
+    """The logo API stand-in, also acting as the server's outbound proxy"""
+
+    def __init__(self, latency, missing, timeouts, hold):
+        self.latency = latency
+        self.missing = missing
+        self.timeouts = timeouts
+        self.hold = hold
+        self.stats = {'found': 0, 'missing': 0, 'timeouts': 0, 'external': 0}
+        self._lock = threading.Lock()
+        self._logo = synthetic_logo()
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _is_missing(self, domain):
+        # A domain has a logo or not for the whole run, like the real API
+        bucket = int(hashlib.sha1(domain.encode('utf-8')).hexdigest()[:8], 16) / 0xffffffff
+        return bucket < self.missing
+
+    def serve(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith(('http://', 'https://')):
+                    return self.refuse()
+                domain = self.path.lstrip('/')
+                if random.random() < stub.timeouts:
+                    stub._count('timeouts')
+                    time.sleep(stub.hold)
+                else:
+                    time.sleep(stub.latency * random.uniform(0.5, 1.5))
+                if stub._is_missing(domain):
+                    stub._count('missing')
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                stub._count('found')
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(stub._logo)))
+                self.end_headers()
+                self.wfile.write(stub._logo)
+
+            def do_CONNECT(self):
+                self.refuse()
+
+            def refuse(self):
+                # Anything proxied here was headed off the machine
+                stub._count('external')
+                print(f"external request refused: {self.command} {self.path}", file=sys.stderr)
+                self.send_response(502)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def synthetic_logo():
+    import io
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGBA', (128, 128), (0, 128, 255, 220)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve_werkzeug(port, workers, threads):
+    """Pre-fork Werkzeug server: workers processes of threads threads each (runs in the server process)"""
+    import logging
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    sys.path.insert(0, BACKEND)
+    os.chdir(BACKEND)
+    from wsgi import app
+
+    # Answers HTTP/1.0, closing each connection: an idle keep-alive
+    # connection would hold one of the few pool threads
+    class PooledServer(BaseWSGIServer):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', port))
+    listener.listen(128)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            PooledServer('127.0.0.1', port, app, fd=listener.fileno()).serve_forever()
+            os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for child in children:
+            os.kill(child, signal.SIGTERM)
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, stop)
+    for child in children:
+        os.waitpid(child, 0)
+
+
+def start_server(server, port, workers, threads, env):
+    if server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning']
+        env = dict(env, FLYER_BIND=f"127.0.0.1:{port}", FLYER_WORKERS=str(workers), FLYER_THREADS=str(threads))
+    else:
+        command = [sys.executable, os.path.abspath(__file__), '--serve', str(port), str(workers), str(threads)]
+    process = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('server did not become ready within 60s')
+
+
+def process_tree(pid):
+    """Return pid and the pids of its children (Linux)"""
+    pids = [pid]
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    return pids
+
+
+def memory_mb(pid):
+    """Return the (RSS, PSS) of a process in MB; PSS is None where the kernel does not report it"""
+    rss = pss = None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) / 1024
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    pss = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return rss, pss
+
+
+class MemorySampler:
+    """Tracks the peak RSS and PSS of a server process and its workers"""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peaks = {}
+        self.pss_peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pid in process_tree(self.pid):
+                rss, pss = memory_mb(pid)
+                if rss is not None:
+                    self.peaks[pid] = max(self.peaks.get(pid, 0), rss)
+                if pss is not None:
+                    self.pss_peaks[pid] = max(self.pss_peaks.get(pid, 0), pss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self):
+        def split(peaks):
+            master = peaks.get(self.pid)
+            return (round(master, 1) if master else None,
+                    [round(mb, 1) for pid, mb in sorted(peaks.items()) if pid != self.pid])
+
+        master, workers = split(self.peaks)
+        master_pss, workers_pss = split(self.pss_peaks)
+        return {'master_mb': master, 'workers_mb': workers,
+                'master_pss_mb': master_pss, 'workers_pss_mb': workers_pss}
+
+
+def drive(base_url, concurrency, duration, warmup, companies, photo, mix, custom_ratio, timeout):
+    """Run the clients and return per-endpoint (seconds, ok) samples after the warmup"""
+    samples = {endpoint: [] for endpoint in ENDPOINTS}
+    errors = {}
+    lock = threading.Lock()
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+    counter = iter(range(10 ** 9))
+
+    def company(rng):
+        if rng.random() < custom_ratio:
+            return f"Stub Startup {rng.randrange(1000)}"
+        return rng.choice(companies)['name']
+
+    def client(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            endpoint = rng.choices(ENDPOINTS, weights=mix)[0]
+            if endpoint == 'generate':
+                # A new name every time: each flyer is an uncached render
+                call = lambda: session.post(
+                    f"{base_url}/api/generate-flyer?format=png",
+                    data={'name': f"Load Tester {next(counter)}", 'former_company': company(rng),
+                          'new_company': company(rng), 'role': 'Engineer', 'announcement_text': 'SIGNED',
+                          'date': '2026-01-01'},
+                    files={'profile_image': ('photo.jpg', photo, 'image/jpeg')}, timeout=timeout)
+            elif endpoint == 'companies':
+                call = lambda: session.get(f"{base_url}/api/companies", timeout=timeout)
+            else:
+                query = rng.choice(companies)['name'][:rng.randint(1, 3)]
+                call = lambda: session.get(f"{base_url}/api/companies", params={'q': query}, timeout=timeout)
+            start = time.monotonic()
+            try:
+                status = call().status_code
+                error = None if status < 400 else str(status)
+            except requests.RequestException as e:
+                error = type(e).__name__
+            elapsed = time.monotonic() - start
+            if start >= measure_from:
+                with lock:
+                    samples[endpoint].append((elapsed, error is None))
+                    if error:
+                        errors[error] = errors.get(error, 0) + 1
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Requests that finished after stop_at still count, so measure the real window
+    return samples, errors, time.monotonic() - measure_from
+
+
+def run_config(server, workers, threads, args, stub_url, companies, photo):
+    tmp = tempfile.mkdtemp(prefix='flyer-load-')
+    port = free_port()
+    proxy = stub_url
+    env = dict(os.environ,
+               FLYER_LOGO_BASE_URL=stub_url,
+               FLYER_LOGO_DEADLINE=str(args.logo_deadline),
+               FLYER_LOGO_CACHE_DIR=os.path.join(tmp, 'logos'),
+               FLYER_RENDER_CACHE_DIR=os.path.join(tmp, 'renders'),
+               FLYER_ARTIFACT_DIR=os.path.join(tmp, 'artifacts'),
+               HTTP_PROXY=proxy, HTTPS_PROXY=proxy, http_proxy=proxy, https_proxy=proxy,
+               NO_PROXY='127.0.0.1,localhost', no_proxy='127.0.0.1,localhost')
+    env.pop('FLYER_TEMPLATE_CACHE_DIR', None)
+    process = start_server(server, port, workers, threads, env)
+    try:
+        with MemorySampler(process.pid) as sampler:
+            samples, errors, window = drive(f"http://127.0.0.1:{port}", args.concurrency, args.duration,
+                                            args.warmup, companies, photo, (args.generate_weight,
+                                            args.companies_weight, args.search_weight),
+                                            args.custom_ratio, args.request_timeout)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    total = sum(len(endpoint_samples) for endpoint_samples in samples.values())
+    failed = sum(1 for endpoint_samples in samples.values() for _, ok in endpoint_samples if not ok)
+    return {
+        'config': f"{workers}x{threads}",
+        'workers': workers,
+        'threads': threads,
+        'requests': total,
+        'throughput_rps': round(total / window, 2) if window > 0 else 0.0,
+        'error_rate': round(failed / total, 4) if total else 0.0,
+        'errors': errors,
+        'endpoints': {endpoint: dict(summarize([seconds for seconds, _ in endpoint_samples]),
+                                     rps=round(len(endpoint_samples) / window, 2))
+                      for endpoint, endpoint_samples in samples.items() if endpoint_samples},
+        'memory': sampler.report(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return (config, metric, before, after) for configurations that regressed"""
+    before_configs = {config['config']: config for config in baseline.get('configs', [])}
+    regressions = []
+    for config in results['configs']:
+        before = before_configs.get(config['config'])
+        if not before:
+            continue
+        if config['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+            regressions.append((config['config'], 'throughput_rps', before['throughput_rps'],
+                                config['throughput_rps']))
+        for endpoint, stats in config['endpoints'].items():
+            previous = before['endpoints'].get(endpoint)
+            if previous and stats['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append((config['config'], f"{endpoint}.p95_ms", previous['p95_ms'], stats['p95_ms']))
+        if config['error_rate'] > before['error_rate'] + 0.01:
+            regressions.append((config['config'], 'error_rate', before['error_rate'], config['error_rate']))
+    return regressions
+
+
+def main():
+    if sys.argv[1:2] == ['--serve']:
+        port, workers, threads = map(int, sys.argv[2:5])
+        return serve_werkzeug(port, workers, threads)
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--configs', default='1x4,2x2', help='comma-separated WORKERSxTHREADS (default 1x4,2x2)')
+    parser.add_argument('--server', choices=['gunicorn', 'werkzeug'], help='default: gunicorn when installed')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=20, help='measured seconds per configuration')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds before each measurement')
+    parser.add_argument('--generate-weight', type=float, default=6, help='share of generate-flyer requests')
+    parser.add_argument('--companies-weight', type=float, default=1, help='share of full directory requests')
+    parser.add_argument('--search-weight', type=float, default=3, help='share of typeahead requests')
+    parser.add_argument('--custom-ratio', type=float, default=0.2,
+                        help='share of companies not in the directory (logos found by guessing domains)')
+    parser.add_argument('--profile-size', default='1920x1080', help='profile picture size (WIDTHxHEIGHT)')
+    parser.add_argument('--logo-latency', type=float, default=0.08, help='mean seconds the logo stand-in takes')
+    parser.add_argument('--logo-404', type=float, default=0.2, help='share of domains without a logo')
+    parser.add_argument('--logo-timeouts', type=float, default=0.02, help='share of logo requests that time out')
+    parser.add_argument('--logo-deadline', type=float, default=2, help='FLYER_LOGO_DEADLINE for the server')
+    parser.add_argument('--request-timeout', type=float, default=30, help='client timeout per request')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='fail on regressions against these results')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed throughput drop and p95 growth (default 0.25)')
+    args = parser.parse_args()
+
+    server = args.server
+    if server is None:
+        try:
+            import gunicorn  # noqa: F401
+            server = 'gunicorn'
+        except ImportError:
+            server = 'werkzeug'
+    configs = [tuple(int(n) for n in config.lower().split('x')) for config in args.configs.split(',')]
+
+    with open(os.path.join(BACKEND, 'companies.json')) as f:
+        companies = json.load(f)['companies']
+    photo = synthetic_photo(tuple(int(n) for n in args.profile_size.lower().split('x')))
+    stub = LogoStub(args.logo_latency, args.logo_404, args.logo_timeouts, hold=args.logo_deadline + 1)
+    stub_url = stub.serve()
+
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'server': server,
+        'cpu_count': os.cpu_count(),
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'logo_stub': {'latency': args.logo_latency, 'missing': args.logo_404, 'timeouts': args.logo_timeouts},
+        'configs': [],
+    }
+    print(f"{'config':<8} {'rps':>8} {'errors':>7} {'endpoint':<10} {'p50':>9} {'p95':>9} {'p99':>9}  memory")
+    for workers, threads in configs:
+        config = run_config(server, workers, threads, args, stub_url, companies, photo)
+        results['configs'].append(config)
+        memory = config['memory']
+        rss = ', '.join(f"{mb:.0f}" for mb in memory['workers_mb']) or '-'
+        pss = ', '.join(f"{mb:.0f}" for mb in memory['workers_pss_mb']) or '-'
+        for i, (endpoint, stats) in enumerate(config['endpoints'].items()):
+            head = (f"{config['config']:<8} {config['throughput_rps']:>8.1f} {config['error_rate']:>6.1%}"
+                    if i == 0 else ' ' * 24)
+            tail = (f"  master {memory['master_mb']} MB, workers {rss} MB" if i == 0 else
+                    f"  pss: master {memory['master_pss_mb']} MB, workers {pss} MB" if i == 1 else '')
+            print(f"{head} {endpoint:<10} {stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms "
+                  f"{stats['p99_ms']:>7.1f}ms{tail}")
+        if config['errors']:
+            print(f"{' ' * 9}errors: {config['errors']}")
+    results['logo_stub']['requests'] = dict(stub.stats)
+    print(f"logo stand-in: {stub.stats['found']} found, {stub.stats['missing']} missing, "
+          f"{stub.stats['timeouts']} held past the deadline; {stub.stats['external']} external requests refused")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failed = stub.stats['external'] > 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for config, metric, before, after in regressions:
+            print(f"REGRESSION {config} {metric}: {before} -> {after}")
+        if regressions:
+            failed = True
+        else:
+            print(f"no regressions against {args.baseline}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
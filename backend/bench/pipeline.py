@@ -0,0 +1,333 @@
+"""Render pipeline benchmark: per-stage latency, throughput and memory
+
+Runs the flyer pipeline offline: logos come from a local stub server
+(outbound connections to anything but loopback are refused) and profile
+pictures are synthetic photos from thumbnail size up to 8K. Each stage is
+timed on its own:
+
+- background: canvas from the cached template layer (cold: painted)
+- font_load: loading every font size of the layout from a cleared cache
+- profile_decode[size]: decode, crop and resize of each synthetic photo
+- mask_composite: pasting the profile picture through the circle mask
+- logo_fetch: resolving both logos through the stub with cold caches
+- text_layout: the layout's draw function (text, banner, logos)
+- encode[format.quality]: each encoder tier, and the default tier
+  (FLYER_DEFAULT_QUALITY) if it is not one of them
+- base64_json: the JSON response body of /api/generate-flyer
+- render: engine.render() end to end, then throughput per core over a
+  process pool
+
+and reported as p50/p95/p99 with the peak RSS seen after each stage.
+
+Usage (from backend/):
+    python bench/pipeline.py [--iterations N] [--output results.json]
+                             [--baseline baseline.json] [--tolerance 0.25]
+
+With --baseline, exits non-zero when the p50 of a hot-path stage is more
+than the tolerance slower than in the baseline file (a previous --output).
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROFILE_SIZES = {
+    'thumb': (256, 256),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+    '8k': (7680, 4320),
+}
+ENCODINGS = (('png', 'lossless'), ('png', 'high'), ('webp', 'high'), ('jpg', 'high'))
+# Stages that run on every uncached flyer request, along with the PNG encode
+# of the default tier (see hot_path()); a slower p50 fails --baseline
+HOT_PATH = ('background', 'profile_decode[1080p]', 'mask_composite', 'text_layout', 'base64_json', 'render')
+# Differences below this are timer noise, whatever the ratio
+MIN_REGRESSION_MS = 0.5
+
+SPEC = {
+    'name': 'Ada Lovelace',
+    'former_company': 'Google',
+    'new_company': 'OpenAI',
+    'role': 'Principal Engineer',
+    'announcement_text': 'SIGNED',
+    'date': '2026-01-01',
+}
+
+
+def serve_stub_logos(latency=0.0):
+    """Serve a PNG logo for every domain on a local port and return its base URL"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGBA', (128, 128), (0, 128, 255, 220)).save(buffer, 'PNG')
+    logo = buffer.getvalue()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(logo)))
+            self.end_headers()
+            self.wfile.write(logo)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def block_network():
+    """Refuse outbound connections to anything but loopback"""
+    connect = socket.socket.connect
+
+    def loopback_only(self, address, *args, **kwargs):
+        if self.family in (socket.AF_INET, socket.AF_INET6) and address[0] not in ('127.0.0.1', '::1', 'localhost'):
+            raise OSError(f"network disabled by pipeline benchmark: {address[0]}")
+        return connect(self, address, *args, **kwargs)
+    socket.socket.connect = loopback_only
+
+
+def synthetic_photo(size):
+    """Return JPEG bytes of a noisy gradient photo, compressing like a real one"""
+    from PIL import Image
+
+    noise = Image.effect_noise(size, 16)
+    gradient = Image.linear_gradient('L').resize(size)
+    photo = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    buffer = io.BytesIO()
+    photo.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of a sorted list"""
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        'n': len(ordered),
+        'mean_ms': ms(sum(ordered) / len(ordered)),
+        'min_ms': ms(ordered[0]),
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+    }
+
+
+class Stages:
+    """Collects timings per stage and the peak RSS after each"""
+
+    def __init__(self, iterations, warmup):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.results = {}
+
+    def time(self, name, run, setup=None):
+        """Time run() over the iterations, calling setup() untimed before each
+
+        Returns the last value run() returned.
+        """
+        samples = []
+        for i in range(self.warmup + self.iterations):
+            state = setup() if setup else None
+            start = time.perf_counter()
+            value = run(state) if setup else run()
+            elapsed = time.perf_counter() - start
+            if i >= self.warmup:
+                samples.append(elapsed)
+        self.results[name] = dict(summarize(samples), peak_rss_mb=peak_rss_mb())
+        return value
+
+
+def _render_many(spec, logos, count):
+    """Render and encode a flyer count times (runs in a worker process)"""
+    from flyer import engine
+    from flyer.encoders import encode
+
+    start = time.perf_counter()
+    for _ in range(count):
+        encode(engine.render(spec, logos), 'png')
+    return time.perf_counter() - start
+
+
+def run(iterations=30, warmup=2, layout='transfer-update', scale=1, logo_latency=0.0, processes=None):
+    """Run every stage and return the results as a dict"""
+    tmp = tempfile.mkdtemp(prefix='flyer-bench-')
+    os.environ.update(
+        FLYER_LOGO_BASE_URL=serve_stub_logos(logo_latency),
+        FLYER_LOGO_CACHE_DIR=os.path.join(tmp, 'logos'),
+        FLYER_RENDER_CACHE_DIR=os.path.join(tmp, 'renders'),
+        FLYER_ARTIFACT_DIR=os.path.join(tmp, 'artifacts'),
+    )
+    os.environ.pop('FLYER_TEMPLATE_CACHE_DIR', None)
+    block_network()
+    sys.path.insert(0, BACKEND)
+
+    from flyer import background, engine, fonts, logos as logo_store
+    from flyer.encoders import DEFAULT_QUALITY, encode
+    from flyer.ingest import load_profile_image
+    from flyer.layouts import FONT, LAYOUTS
+    from flyer.masks import circle_mask
+
+    # Generated in a helper process so building 8K images does not count
+    # towards this process's peak RSS
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        photos = dict(zip(PROFILE_SIZES, pool.map(synthetic_photo, PROFILE_SIZES.values())))
+    baseline_rss = peak_rss_mb()
+    stages = Stages(iterations, warmup)
+    spec = dict(SPEC, layout=layout, scale=scale, profile_image=photos['1080p'])
+    size = engine.canvas_size(spec)
+    profile_size = engine._scaled(spec, LAYOUTS[layout]['profile_size'])
+    draw = LAYOUTS[layout]['draw']
+    font_sizes = [engine._scaled(spec, font_size) for font_size in LAYOUTS[layout]['font_sizes']]
+
+    def cold_background():
+        background.clear_cache()
+        return background.get_layer(layout, size)
+
+    def cold_fonts():
+        fonts.clear_cache()
+        fonts.prewarm(FONT, font_sizes)
+
+    def cold_logos():
+        domains = [engine.logo_domains(spec['former_company']), engine.logo_domains(spec['new_company'])]
+        logo_store.invalidate({domain for candidates in domains for domain in candidates})
+        return engine.resolve_logos(spec)
+
+    # Library chatter (missing font files, fallbacks) would drown the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        stages.time('background_cold', cold_background)
+        stages.time('background', lambda: background.new_canvas(layout, size))
+        stages.time('font_load', cold_fonts)
+        for name, photo in photos.items():
+            stages.time(f"profile_decode[{name}]", lambda: load_profile_image(photo, profile_size))
+        profile = load_profile_image(photos['1080p'], profile_size)
+        stages.time('mask_composite', lambda canvas: canvas.paste(profile, (0, 0), circle_mask(profile_size)),
+                    setup=lambda: background.new_canvas(layout, size))
+        logos = stages.time('logo_fetch', cold_logos)
+        stages.time('text_layout', lambda canvas: draw(canvas, spec, profile, logos),
+                    setup=lambda: background.new_canvas(layout, size))
+        image = engine.render(spec, logos)
+        encodings = ENCODINGS if ('png', DEFAULT_QUALITY) in ENCODINGS else (('png', DEFAULT_QUALITY),) + ENCODINGS
+        for fmt, quality in encodings:
+            stages.time(f"encode[{fmt}.{quality}]", lambda: encode(image, fmt, quality))
+        png = encode(image, 'png')
+        stages.time('base64_json', lambda: json.dumps({
+            'success': True, 'id': '0' * 32, 'url': f"/api/flyers/{'0' * 32}",
+            'image_data': base64.b64encode(png).decode('utf-8'), 'filename': 'flyer.png'}))
+        stages.time('render', lambda: engine.render(spec, logos))
+
+        # Uncached render + PNG encode throughput, one worker per core
+        processes = processes or os.cpu_count() or 1
+        per_worker = max(iterations // 2, 1)
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            start = time.perf_counter()
+            worker_seconds = list(pool.map(_render_many, [spec] * processes, [logos] * processes,
+                                           [per_worker] * processes))
+            wall = time.perf_counter() - start
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'layout': layout,
+        'size': list(size),
+        'iterations': iterations,
+        'default_quality': DEFAULT_QUALITY,
+        'stages': stages.results,
+        'throughput': {
+            'processes': processes,
+            'flyers_per_second': round(processes * per_worker / wall, 2),
+            'flyers_per_second_per_core': round(per_worker / (sum(worker_seconds) / processes), 2),
+        },
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def hot_path(results):
+    """Return the hot-path stages of a run, including the encode requests get by default"""
+    return HOT_PATH[:-2] + (f"encode[png.{results['default_quality']}]",) + HOT_PATH[-2:]
+
+
+def compare(results, baseline, tolerance):
+    """Return (stage, baseline p50, current p50) for hot-path stages that regressed"""
+    regressions = []
+    for stage in hot_path(results):
+        before = baseline.get('stages', {}).get(stage)
+        after = results['stages'].get(stage)
+        if not before or not after:
+            continue
+        if (after['p50_ms'] > before['p50_ms'] * (1 + tolerance)
+                and after['p50_ms'] - before['p50_ms'] > MIN_REGRESSION_MS):
+            regressions.append((stage, before['p50_ms'], after['p50_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=30, help='timed runs per stage')
+    parser.add_argument('--warmup', type=int, default=2, help='untimed runs per stage')
+    parser.add_argument('--layout', default='transfer-update')
+    parser.add_argument('--scale', type=float, default=1)
+    parser.add_argument('--logo-latency', type=float, default=0.0, help='seconds the stub logo server waits')
+    parser.add_argument('--processes', type=int, help='workers for the throughput run (default: CPU count)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='fail on hot-path regressions against these results')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown (default 0.25)')
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.warmup, args.layout, args.scale, args.logo_latency, args.processes)
+
+    print(f"{'stage':<24} {'p50':>9} {'p95':>9} {'p99':>9} {'rss':>8}")
+    for name, stage in results['stages'].items():
+        print(f"{name:<24} {stage['p50_ms']:>7.2f}ms {stage['p95_ms']:>7.2f}ms {stage['p99_ms']:>7.2f}ms "
+              f"{stage['peak_rss_mb']:>6.0f}MB")
+    throughput = results['throughput']
+    print(f"throughput: {throughput['flyers_per_second']} flyers/s on {throughput['processes']} processes, "
+          f"{throughput['flyers_per_second_per_core']} per core; peak RSS {results['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for stage, before, after in regressions:
+            print(f"REGRESSION {stage}: p50 {before:.2f}ms -> {after:.2f}ms")
+        if regressions:
+            sys.exit(1)
+        print(f"no hot-path regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
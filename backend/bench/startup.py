@@ -0,0 +1,122 @@
+"""Startup benchmark: time to first-request readiness without network access
+
+Imports an entry point in a fresh interpreter with outbound connections
+disabled, then times the first /health, /api/companies and generate-flyer
+requests. Logo lookups fail fast instead of hitting the network, so the
+numbers reflect import work (fonts, templates, company index) alone.
+
+Usage (from backend/):
+    python bench/startup.py [backend|wsgi|api] [--budget SECONDS] [--json]
+
+backend is app.py (the development server), wsgi the production entry
+point wsgi.py.
+
+Exits non-zero when readiness (import plus first health check) exceeds the
+budget or any connection was attempted during import.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Runs in the child interpreter
+CHILD = r'''
+import io, json, socket, sys, time, importlib, importlib.util
+
+attempts = []
+def refuse(self, address, *args, **kwargs):
+    attempts.append(str(address))
+    raise OSError('network disabled by startup benchmark')
+def refuse_lookup(host, *args, **kwargs):
+    attempts.append(str(host))
+    raise socket.gaierror('network disabled by startup benchmark')
+socket.socket.connect = refuse
+socket.socket.connect_ex = refuse
+socket.getaddrinfo = refuse_lookup
+
+which, root = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+if which in ('backend', 'wsgi'):
+    sys.path.insert(0, root + '/backend')
+    module = importlib.import_module('app' if which == 'backend' else 'wsgi')
+    health = '/health'
+else:
+    spec = importlib.util.spec_from_file_location('api_index', root + '/api/index.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    health = '/api/health'
+timings = {'import': time.perf_counter() - start}
+import_attempts = len(attempts)
+
+client = module.app.test_client()
+def timed(name, call):
+    t = time.perf_counter()
+    response = call()
+    timings[name] = time.perf_counter() - t
+    return response.status_code
+
+from PIL import Image
+photo = io.BytesIO()
+Image.new('RGB', (640, 480), (200, 10, 10)).save(photo, 'JPEG')
+photo.seek(0)
+statuses = {
+    'health': timed('first_health', lambda: client.get(health)),
+    'companies': timed('first_companies', lambda: client.get('/api/companies')),
+    'flyer': timed('first_flyer', lambda: client.post(
+        '/api/generate-flyer?format=png',
+        data={'name': 'Ada Lovelace', 'former_company': 'Google', 'new_company': 'OpenAI',
+              'role': 'Engineer', 'announcement_text': 'SIGNED', 'date': '2026-01-01',
+              'profile_image': (photo, 'p.jpg')},
+        content_type='multipart/form-data')),
+}
+timings['ready'] = timings['import'] + timings['first_health']
+print(json.dumps({'entry_point': which, 'timings': timings, 'statuses': statuses,
+                  'import_connection_attempts': import_attempts,
+                  'connection_attempts': len(attempts)}))
+'''
+
+
+def run(which):
+    # Start from empty caches so the first flyer is a cold render
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   FLYER_LOGO_DEADLINE=os.environ.get('FLYER_LOGO_DEADLINE', '1'),
+                   FLYER_LOGO_CACHE_DIR=os.path.join(tmp, 'logos'),
+                   FLYER_RENDER_CACHE_DIR=os.path.join(tmp, 'renders'),
+                   FLYER_ARTIFACT_DIR=os.path.join(tmp, 'artifacts'))
+        env.pop('FLYER_TEMPLATE_CACHE_DIR', None)
+        output = subprocess.run([sys.executable, '-c', CHILD, which, ROOT], cwd=os.path.join(ROOT, 'backend'),
+                                env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('entry_points', nargs='*', metavar='{backend,wsgi,api}')
+    parser.add_argument('--budget', type=float, default=5.0, help='seconds allowed to first-request readiness')
+    parser.add_argument('--json', action='store_true', help='print raw JSON results')
+    args = parser.parse_args()
+    unknown = set(args.entry_points) - {'backend', 'wsgi', 'api'}
+    if unknown:
+        parser.error(f"unknown entry point: {', '.join(sorted(unknown))}")
+
+    ok = True
+    for which in args.entry_points or ['backend', 'wsgi', 'api']:
+        result = run(which)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            timings = ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in result['timings'].items())
+            print(f"{which}: {timings}; connections attempted: {result['import_connection_attempts']} "
+                  f"during import, {result['connection_attempts']} total")
+        if result['timings']['ready'] > args.budget or result['import_connection_attempts']:
+            ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
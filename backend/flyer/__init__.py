@@ -0,0 +1,5 @@
+"""Flyer rendering engine and the HTTP API shared by the Flask backend and the serverless API
+
+flyer.engine.render(spec) renders a flyer; flyer.web.create_app() wraps it in
+the Flask API.
+"""
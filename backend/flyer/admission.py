@@ -0,0 +1,121 @@
+"""Admission control for CPU-bound renders
+
+An AdmissionController lets at most MAX_CONCURRENT renders run at once in a
+process. Further renders wait in a bounded first-in, first-out queue. A
+render arriving to a full queue is refused at once with 429; one that waits
+longer than QUEUE_TIMEOUT is refused with 503. Both carry a Retry-After
+estimate, so a burst sheds load early instead of every request slowing down
+together. A request rendering several flyers at once (a batch) takes as
+many slots as it keeps busy, up to the whole limit.
+
+Each worker process admits its own renders; MAX_CONCURRENT is per process.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from . import metrics
+
+# 0 turns admission control off
+MAX_CONCURRENT = int(os.environ.get('FLYER_MAX_CONCURRENT_RENDERS', str(os.cpu_count() or 1)))
+QUEUE_SIZE = int(os.environ.get('FLYER_RENDER_QUEUE_SIZE', str(4 * MAX_CONCURRENT)))
+QUEUE_TIMEOUT = float(os.environ.get('FLYER_RENDER_QUEUE_TIMEOUT', '10'))
+
+
+class Overloaded(Exception):
+    """A render was refused; status_code is 429 (queue full) or 503 (waited too long)"""
+    def __init__(self, status_code, retry_after):
+        super().__init__('Too many flyers are being rendered, try again later')
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds the renders running at once, queueing a limited number more"""
+
+    def __init__(self, limit=MAX_CONCURRENT, queue_size=QUEUE_SIZE, timeout=QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = deque()
+        self._stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0,
+                       'finished': 0, 'run_seconds': 0.0}
+
+    def retry_after(self):
+        """Return the seconds a refused client should wait before retrying"""
+        with self._lock:
+            finished = self._stats['finished']
+            mean_run = self._stats['run_seconds'] / finished if finished else 1.0
+            backlog = self._running + len(self._waiting)
+        return max(1, round(mean_run * backlog / max(self.limit, 1)))
+
+    def _enter(self, slots):
+        """Take render slots, waiting in the queue if needed"""
+        with self._lock:
+            if self._running + slots <= self.limit and not self._waiting:
+                self._running += slots
+                self._stats['admitted'] += 1
+                return
+            if len(self._waiting) >= self.queue_size:
+                self._stats['rejected'] += 1
+                full = True
+            else:
+                full = False
+                ticket = (threading.Event(), slots)
+                self._waiting.append(ticket)
+                self._stats['queued'] += 1
+        if full:
+            raise Overloaded(429, self.retry_after())
+
+        start = time.monotonic()
+        granted = ticket[0].wait(self.timeout)
+        with self._lock:
+            # The slots may have been handed over just as the wait timed out
+            if not granted and not ticket[0].is_set():
+                self._waiting.remove(ticket)
+                self._stats['timed_out'] += 1
+            else:
+                granted = True
+                self._stats['admitted'] += 1
+        metrics.observe('flyer_admission_wait_seconds', time.monotonic() - start)
+        if not granted:
+            raise Overloaded(503, self.retry_after())
+
+    def _exit(self, slots, seconds):
+        with self._lock:
+            self._stats['finished'] += 1
+            self._stats['run_seconds'] += seconds
+            self._running -= slots
+            # Hand the freed slots straight to the longest waiters, in order
+            while self._waiting and self._running + self._waiting[0][1] <= self.limit:
+                ticket, waiter_slots = self._waiting.popleft()
+                self._running += waiter_slots
+                ticket.set()
+
+    @contextmanager
+    def admit(self, slots=1):
+        """Hold render slots for the enclosed block; raises Overloaded when saturated
+
+        slots is the number of flyers the block renders at once; more than
+        the limit takes all of them.
+        """
+        if self.limit <= 0:
+            yield
+            return
+        slots = min(max(slots, 1), self.limit)
+        self._enter(slots)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._exit(slots, time.monotonic() - start)
+
+    def stats(self):
+        """Return running and queued renders, the limits and outcome counters"""
+        with self._lock:
+            return dict(self._stats, running=self._running, waiting=len(self._waiting),
+                        limit=self.limit, queue_size=self.queue_size)
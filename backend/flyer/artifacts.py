@@ -0,0 +1,173 @@
+"""Bounded, self-cleaning store for generated flyers
+
+Each artifact is a single file named by its ID under a two-level fan-out
+directory. A background thread deletes artifacts older than MAX_AGE and, when
+the store grows past MAX_BYTES, the oldest ones until it is under LOW_WATER of
+it again, so disk and inode use stay flat under sustained traffic and a full
+store is not rescanned on every save.
+
+An artifact saved from a file that already holds its bytes (the render
+cache's copy) is hard-linked to it, so the bytes are on disk only once.
+"""
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.environ.get('FLYER_ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'flyer-artifacts'))
+MAX_BYTES = int(os.environ.get('FLYER_ARTIFACT_MAX_BYTES', str(256 * 1024 * 1024)))
+MAX_AGE = int(os.environ.get('FLYER_ARTIFACT_MAX_AGE', str(24 * 3600)))
+SWEEP_INTERVAL = int(os.environ.get('FLYER_ARTIFACT_SWEEP_INTERVAL', '60'))
+# Share of MAX_BYTES the store is trimmed to once it outgrows it
+LOW_WATER = float(os.environ.get('FLYER_ARTIFACT_LOW_WATER', '0.9'))
+
+EXTENSIONS = ('png', 'webp', 'jpg')
+_ID_PATTERN = re.compile(r'^[0-9a-f]{16,64}$')
+
+_lock = threading.Lock()
+_sweep_lock = threading.Lock()
+_total_bytes = None
+_sweeper_pid = None
+
+
+def _path(artifact_id, ext):
+    return os.path.join(ROOT, artifact_id[:2], f"{artifact_id}.{ext}")
+
+
+def _scan():
+    """Return (mtime, size, path) of every artifact"""
+    entries = []
+    for root, _, files in os.walk(ROOT):
+        for filename in files:
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def sweep(wait=True):
+    """Delete expired artifacts, then the oldest ones until the store is under LOW_WATER
+
+    The store is scanned without holding _lock. Returns the number of files
+    deleted, or None when wait is False and another sweep is running.
+    """
+    global _total_bytes
+    if not _sweep_lock.acquire(blocking=wait):
+        return None
+    try:
+        entries = sorted(_scan())
+        total = sum(size for _, size, _ in entries)
+        target = MAX_BYTES * LOW_WATER if total > MAX_BYTES else total
+        cutoff = time.time() - MAX_AGE
+        deleted = 0
+        for mtime, size, path in entries:
+            if mtime >= cutoff and total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                deleted += 1
+            except OSError:
+                pass
+        # Saves that raced the scan are picked up by the next one
+        with _lock:
+            _total_bytes = total
+        return deleted
+    finally:
+        _sweep_lock.release()
+
+
+def _sweep_forever():
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        try:
+            sweep()
+        except Exception:
+            logger.exception("Artifact sweep failed")
+
+
+def _ensure_sweeper():
+    """Start the background sweeper in this process if it is not running"""
+    global _sweeper_pid
+    # A worker forked from a preloaded master inherits _sweeper_pid but not
+    # the master's sweeper thread, so the pid tells whether it runs here
+    if _sweeper_pid == os.getpid():
+        return
+    _sweeper_pid = os.getpid()
+    threading.Thread(target=_sweep_forever, name='artifact-sweeper', daemon=True).start()
+
+
+def save(data, ext='png', artifact_id=None, source=None):
+    """Store artifact bytes and return the artifact ID
+
+    A new random ID is generated unless one is given; saving the same ID and
+    extension again just refreshes the artifact's age. source may name a
+    file holding the same bytes, which the artifact is hard-linked to when
+    the filesystem allows it.
+    """
+    global _total_bytes
+    if ext not in EXTENSIONS:
+        raise ValueError(f"Unsupported artifact type: {ext}")
+    artifact_id = artifact_id or uuid.uuid4().hex
+    if not _ID_PATTERN.match(artifact_id):
+        raise ValueError(f"Invalid artifact ID: {artifact_id}")
+    _ensure_sweeper()
+
+    path = _path(artifact_id, ext)
+    if os.path.exists(path):
+        os.utime(path)
+        return artifact_id
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    linked = False
+    if source:
+        try:
+            os.link(source, tmp_path)
+            linked = True
+        except OSError:
+            # Gone since it was looked up, or on another filesystem
+            pass
+    if not linked:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+    with _lock:
+        if _total_bytes is not None:
+            _total_bytes += len(data)
+        over_quota = _total_bytes is None or _total_bytes > MAX_BYTES
+    if over_quota:
+        sweep(wait=False)
+    return artifact_id
+
+
+def find(artifact_id, ext=None):
+    """Return (path, ext) of a stored artifact, or None
+
+    Without an extension the first stored type in EXTENSIONS order is used.
+    """
+    if not _ID_PATTERN.match(artifact_id):
+        return None
+    for candidate in ([ext] if ext else EXTENSIONS):
+        if candidate not in EXTENSIONS:
+            continue
+        path = _path(artifact_id, candidate)
+        if os.path.exists(path):
+            return path, candidate
+    return None
+
+
+def usage():
+    """Return the number of artifacts and their total size in bytes"""
+    entries = _scan()
+    return {'files': len(entries), 'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': MAX_BYTES, 'max_age': MAX_AGE}
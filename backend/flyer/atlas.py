@@ -0,0 +1,300 @@
+"""Logo atlas packed offline from companies.json
+
+`python -m flyer.atlas build` (run from backend/) fetches the logo of every
+company in companies.json once, from the logo API or a local mirror
+directory, and writes to ATLAS_DIR:
+
+- atlas.rgba: the logos as TILE x TILE RGBA tiles, back to back
+- atlas.json: the index (tile number and digest per domain, the domains
+  without a logo, the sprite sheet's geometry)
+- sprite.png: the same logos in a grid of SPRITE_TILE px cells, served to
+  the frontend as one cacheable image
+
+The renderer memory-maps atlas.rgba, so a directory company's logo is a
+resize of a tile the OS shares between worker processes: no HTTP request
+and no cache record. Companies added after the atlas was built fall back to
+the logo store.
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+ATLAS_DIR = os.environ.get('FLYER_LOGO_ATLAS_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'logos'))
+INDEX_FILE = 'atlas.json'
+PIXELS_FILE = 'atlas.rgba'
+SPRITE_FILE = 'sprite.png'
+SPRITE_URL = '/api/logos/sprite.png'
+FORMAT_VERSION = 1
+# The logo API serves 128px images, so larger tiles would add nothing
+TILE = 128
+TILE_BYTES = TILE * TILE * 4
+SPRITE_TILE = 64
+SPRITE_COLUMNS = 10
+
+_lock = threading.Lock()
+_atlas = None
+
+
+def _open(directory):
+    """Load an atlas index and map its pixels, or return None"""
+    try:
+        with open(os.path.join(directory, INDEX_FILE), 'r') as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Failed to read logo atlas index: %s", e)
+        return None
+    if index.get('version') != FORMAT_VERSION or index.get('tile') != TILE:
+        logger.warning("Ignoring logo atlas built by another version (run `python -m flyer.atlas build`)")
+        return None
+    try:
+        with open(os.path.join(directory, PIXELS_FILE), 'rb') as f:
+            # The mapping stays valid after the file is closed
+            pixels = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        logger.warning("Failed to map logo atlas: %s", e)
+        return None
+    if len(pixels) != len(index['tiles']) * TILE_BYTES:
+        logger.warning("Ignoring logo atlas: atlas.rgba does not match atlas.json")
+        pixels.close()
+        return None
+    return {
+        'positions': {tile['domain']: number for number, tile in enumerate(index['tiles'])},
+        'tiles': index['tiles'],
+        'missing': set(index['missing']),
+        'sprite': index['sprite'],
+        'pixels': pixels,
+        'directory': directory,
+    }
+
+
+def _get():
+    """Return the loaded atlas, loading it on first use; None without one"""
+    global _atlas
+    if _atlas is None:
+        with _lock:
+            if _atlas is None:
+                _atlas = _open(ATLAS_DIR) or False
+    return _atlas or None
+
+
+def lookup(domain, size):
+    """Return (known, logo) for a domain from the atlas
+
+    known is True when the atlas was built with the domain: logo is then its
+    size x size RGBA logo, or None when the logo API had none. The digest of
+    the tile is kept in the image's info['digest'].
+    """
+    atlas = _get()
+    if atlas is None:
+        return False, None
+    number = atlas['positions'].get(domain)
+    if number is None:
+        return domain in atlas['missing'], None
+    offset = number * TILE_BYTES
+    tile = Image.frombuffer('RGBA', (TILE, TILE), memoryview(atlas['pixels'])[offset:offset + TILE_BYTES],
+                            'raw', 'RGBA', 0, 1)
+    logo = tile.copy() if size == TILE else tile.resize((size, size), Image.Resampling.LANCZOS)
+    logo.info['digest'] = atlas['tiles'][number]['digest']
+    return True, logo
+
+
+def sprite_position(domain):
+    """Return where a domain's logo sits in the sprite sheet, or None
+
+    The dict holds the sheet's url, width and height, the cell size and the
+    logo's x and y, all in sheet pixels.
+    """
+    atlas = _get()
+    if atlas is None or domain not in atlas['positions']:
+        return None
+    sprite = atlas['sprite']
+    number = atlas['positions'][domain]
+    return {
+        'url': f"{SPRITE_URL}?v={sprite['digest'][:16]}",
+        'width': sprite['width'],
+        'height': sprite['height'],
+        'size': sprite['tile'],
+        'x': (number % sprite['columns']) * sprite['tile'],
+        'y': (number // sprite['columns']) * sprite['tile'],
+    }
+
+
+def sprite():
+    """Return (PNG bytes, digest) of the sprite sheet, or None"""
+    atlas = _get()
+    if atlas is None:
+        return None
+    if 'sprite_data' not in atlas:
+        try:
+            with open(os.path.join(atlas['directory'], SPRITE_FILE), 'rb') as f:
+                atlas['sprite_data'] = f.read()
+        except OSError as e:
+            logger.warning("Failed to read logo sprite sheet: %s", e)
+            atlas['sprite_data'] = None
+    if atlas['sprite_data'] is None:
+        return None
+    return atlas['sprite_data'], atlas['sprite']['digest']
+
+
+def cache_info():
+    """Return the number of logos and known-missing domains in the atlas"""
+    atlas = _get()
+    if atlas is None:
+        return {'logos': 0, 'missing': 0}
+    return {'logos': len(atlas['tiles']), 'missing': len(atlas['missing'])}
+
+
+def clear_cache():
+    """Forget the loaded atlas so the next use reads ATLAS_DIR again"""
+    global _atlas
+    with _lock:
+        # The old mapping is left to the garbage collector: tiles may still
+        # be viewing it
+        _atlas = None
+
+
+def _read_source(source, domain, timeout):
+    """Return the logo bytes for a domain, or None when there is none
+
+    source is a logo API base URL or a directory of files named after the
+    domains (optionally with .png). Only the statuses the logo store caches
+    as "no logo" count as missing; any other failure raises, so a rate limit
+    during the build is never recorded as a domain without a logo.
+    """
+    from .logos import MISSING_STATUSES
+
+    if os.path.isdir(source):
+        for name in (domain, f"{domain}.png"):
+            path = os.path.join(source, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    return f.read()
+        return None
+    response = requests.get(f"{source.rstrip('/')}/{domain}", timeout=timeout)
+    if response.status_code == 200:
+        return response.content
+    if response.status_code in MISSING_STATUSES:
+        return None
+    raise requests.HTTPError(f"{response.status_code} from {response.url}", response=response)
+
+
+def _tile(content):
+    """Decode logo bytes into a TILE x TILE RGBA tile"""
+    logo = Image.open(io.BytesIO(content)).convert('RGBA')
+    if logo.size != (TILE, TILE):
+        logo = logo.resize((TILE, TILE), Image.Resampling.LANCZOS)
+    return logo
+
+
+def _write_file(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build(companies, source, directory=ATLAS_DIR, timeout=10, workers=8, partial=False):
+    """Fetch the logos of a companies list and write the atlas to directory
+
+    Returns the domains that could not be fetched. Unless partial is set,
+    nothing is written then, so a flaky source never replaces a good atlas;
+    with partial, they are left out and resolved through the logo store at
+    render time.
+    """
+    domains = list(dict.fromkeys(company['domain'] for company in companies))
+
+    def fetch(domain):
+        try:
+            content = _read_source(source, domain, timeout)
+        except (OSError, requests.RequestException) as e:
+            return domain, None, e
+        if content is None:
+            return domain, None, None
+        try:
+            return domain, _tile(content), None
+        except Exception as e:
+            logger.warning("Skipping unreadable logo for %s: %s", domain, e)
+            return domain, None, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(fetch, domains))
+
+    tiles = [(domain, tile) for domain, tile, error in results if tile is not None]
+    missing = [domain for domain, tile, error in results if tile is None and error is None]
+    failed = [domain for domain, tile, error in results if error is not None]
+    for domain, _, error in results:
+        if error is not None:
+            logger.warning("Failed to fetch logo for %s: %s", domain, error)
+    if failed and not partial:
+        logger.error("Not writing the atlas: %d logos failed (use --partial to leave them out)", len(failed))
+        return failed
+
+    columns = min(SPRITE_COLUMNS, len(tiles)) or 1
+    rows = (len(tiles) + columns - 1) // columns
+    sheet = Image.new('RGBA', (columns * SPRITE_TILE, max(rows, 1) * SPRITE_TILE), (0, 0, 0, 0))
+    pixels = bytearray()
+    entries = []
+    for number, (domain, tile) in enumerate(tiles):
+        data = tile.tobytes()
+        pixels += data
+        entries.append({'domain': domain, 'digest': hashlib.sha256(data).hexdigest()})
+        cell = tile.resize((SPRITE_TILE, SPRITE_TILE), Image.Resampling.LANCZOS)
+        sheet.paste(cell, ((number % columns) * SPRITE_TILE, (number // columns) * SPRITE_TILE))
+    buffer = io.BytesIO()
+    sheet.save(buffer, 'PNG', optimize=True)
+    sprite_data = buffer.getvalue()
+
+    index = {
+        'version': FORMAT_VERSION,
+        'tile': TILE,
+        'tiles': entries,
+        'missing': sorted(missing),
+        'sprite': {'tile': SPRITE_TILE, 'columns': columns, 'width': sheet.width, 'height': sheet.height,
+                   'digest': hashlib.sha256(sprite_data).hexdigest()},
+    }
+    os.makedirs(directory, exist_ok=True)
+    # The index goes last so it never describes pixels that are not there yet
+    _write_file(os.path.join(directory, PIXELS_FILE), bytes(pixels))
+    _write_file(os.path.join(directory, SPRITE_FILE), sprite_data)
+    _write_file(os.path.join(directory, INDEX_FILE), (json.dumps(index, indent=2) + '\n').encode('utf-8'))
+    logger.info("Packed %d logos into %s (%d without a logo, %d failed)", len(tiles), directory, len(missing), len(failed))
+    return failed
+
+
+def main():
+    from .companies import load_companies
+    from .logos import LOGO_BASE_URL
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    parser = argparse.ArgumentParser(prog='python -m flyer.atlas', description='Build the logo atlas')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--companies', default=os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), 'companies.json'), help='companies.json to read')
+    parser.add_argument('--source', default=LOGO_BASE_URL,
+                        help='logo API base URL or directory of logo files (default: FLYER_LOGO_BASE_URL)')
+    parser.add_argument('--output', default=ATLAS_DIR, help='directory to write the atlas to')
+    parser.add_argument('--timeout', type=float, default=10, help='seconds per logo request')
+    parser.add_argument('--partial', action='store_true', help='write the atlas even if some logos failed')
+    args = parser.parse_args()
+    failed = build(load_companies(args.companies), args.source, args.output, args.timeout, partial=args.partial)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Pre-rendered background layers for flyer templates
+
+Everything a flyer draws before it touches request data (the circuit board
+pattern, glow nodes, static header text) is identical for every request.
+Templates register a painter for those layers; the painter runs once per
+(template, size) and every flyer starts from a copy of the cached result.
+The most recently used LAYER_CACHE_SIZE layers are kept in memory.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw
+
+from . import fonts
+
+logger = logging.getLogger(__name__)
+
+# Optional directory for persisting rendered layers as raw RGB bytes, so a
+# fresh worker can skip the painter entirely
+CACHE_DIR = os.environ.get('FLYER_TEMPLATE_CACHE_DIR')
+# A layer is up to ~19 MB at 3x
+LAYER_CACHE_SIZE = int(os.environ.get('FLYER_TEMPLATE_CACHE_SIZE', '8'))
+
+BACKGROUND_COLOR = (15, 23, 42)  # Dark navy blue
+CIRCUIT_COLOR = (30, 58, 138)    # Darker blue for circuit lines
+GLOW_COLOR = (59, 130, 246)      # Bright blue for glowing effects
+NODE_CORE_COLOR = (147, 197, 253)
+
+_templates = {}
+_layers = OrderedDict()
+_lock = threading.Lock()
+
+
+def register_template(name, painter, version=1, background_color=BACKGROUND_COLOR):
+    """Register a template painter
+
+    The painter is called as painter(img, draw) on a fresh canvas and must only
+    draw request-independent content. Bump version whenever the painter output
+    changes so persisted layers are not reused.
+    """
+    with _lock:
+        _templates[name] = {
+            'painter': painter,
+            'version': version,
+            'background_color': background_color,
+        }
+        # Drop layers rendered by a previous registration of this name
+        for key in [k for k in _layers if k[0] == name]:
+            del _layers[key]
+
+
+def template_version(name):
+    """Return the registered version of a template"""
+    return _templates[name]['version']
+
+
+def template_background_color(name):
+    """Return the background color of a template"""
+    return _templates[name]['background_color']
+
+
+def _raw_path(name, size, version):
+    # Painters draw text, so a layer is only reusable with the same fonts
+    return os.path.join(CACHE_DIR, f"{name}_{size[0]}x{size[1]}_v{version}_{fonts.digest()[:12]}.raw")
+
+
+def _load_raw(name, size, version):
+    """Load a persisted layer, or None if there is none"""
+    if not CACHE_DIR:
+        return None
+    path = _raw_path(name, size, version)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        return Image.frombytes('RGB', size, data)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_raw(name, size, version, layer):
+    """Persist a layer as raw RGB bytes; failures only cost a re-render"""
+    if not CACHE_DIR:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _raw_path(name, size, version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(layer.tobytes())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Failed to persist template layer %s: %s", name, e)
+
+
+def _render(name, size):
+    template = _templates[name]
+    layer = _load_raw(name, size, template['version'])
+    if layer is None:
+        layer = Image.new('RGB', size, template['background_color'])
+        template['painter'](layer, ImageDraw.Draw(layer))
+        _save_raw(name, size, template['version'], layer)
+    return layer
+
+
+def get_layer(name, size):
+    """Return the shared rendered layer for a template and size
+
+    The returned image is shared between requests and must not be modified;
+    use new_canvas() to get a drawable copy.
+    """
+    key = (name, tuple(size))
+    with _lock:
+        layer = _layers.get(key)
+        if layer is None:
+            layer = _render(name, key[1])
+            _layers[key] = layer
+            while len(_layers) > LAYER_CACHE_SIZE:
+                _layers.popitem(last=False)
+        else:
+            _layers.move_to_end(key)
+    return layer
+
+
+def new_canvas(name, size):
+    """Return a fresh canvas pre-filled with the template's static layers"""
+    return get_layer(name, size).copy()
+
+
+def clear_cache():
+    """Forget all rendered layers held in memory"""
+    with _lock:
+        _layers.clear()
+
+
+def draw_circuit_board(draw, width, height, diagonals=True, scale=1):
+    """Draw the circuit board grid, optional diagonals and glowing nodes
+
+    scale multiplies the grid spacing and node sizes of the 1x design.
+    """
+    def S(value):
+        return round(value * scale)
+
+    line_width = max(S(1), 1)
+    spacing = max(S(40), 1)
+    for i in range(0, width, spacing):
+        draw.line([(i, 0), (i, height)], fill=CIRCUIT_COLOR, width=line_width)
+    for i in range(0, height, spacing):
+        draw.line([(0, i), (width, i)], fill=CIRCUIT_COLOR, width=line_width)
+
+    if diagonals:
+        for i in range(0, width + height, 2 * spacing):
+            draw.line([(i, 0), (i - height, height)], fill=CIRCUIT_COLOR, width=line_width)
+            draw.line([(0, i), (width, i - width)], fill=CIRCUIT_COLOR, width=line_width)
+
+    for i in range(8):
+        x = S((i * 100 + 50) % round(width / scale))
+        y = S((i * 120 + 60) % round(height / scale))
+        # Outer glow
+        draw.ellipse([x-S(6), y-S(6), x+S(6), y+S(6)], fill=GLOW_COLOR)
+        # Inner bright core
+        draw.ellipse([x-S(3), y-S(3), x+S(3), y+S(3)], fill=NODE_CORE_COLOR)
@@ -0,0 +1,136 @@
+"""Parallel batch rendering on a shared process pool
+
+Batch items are rendered in worker processes so a batch uses every core.
+Workers are never forked from the server process itself: its other threads
+may hold locks at that moment, which a forked child would inherit held and
+wait on forever. Where available they are forked from a single-threaded
+forkserver that has imported the engine, otherwise spawned, and each
+warms the layout's caches up once as it starts.
+
+A pool whose worker died is replaced on the next submit().
+"""
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import engine, warmup
+from .encoders import DEFAULT_QUALITY, encode
+from .logos import DEADLINE as LOGO_DEADLINE, MAX_WORKERS as LOGO_WORKERS, find_logos
+
+MAX_SIZE = int(os.environ.get('FLYER_BATCH_MAX_SIZE', '50'))
+WORKERS = int(os.environ.get('FLYER_BATCH_WORKERS', str(os.cpu_count() or 1)))
+# Ceiling for a batch request body
+MAX_REQUEST_BYTES = int(os.environ.get('FLYER_BATCH_MAX_BYTES', str(64 * 1024 * 1024)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(layout):
+    warmup.warm(layout)
+
+
+def _new_pool(layout):
+    methods = multiprocessing.get_all_start_methods()
+    if 'forkserver' in methods:
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=WORKERS, mp_context=context,
+                               initializer=_init_worker, initargs=(layout,))
+
+
+def get_pool(layout=engine.DEFAULT_LAYOUT):
+    """Return the shared process pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _new_pool(layout)
+        return _pool
+
+
+def _replace_pool(broken, layout):
+    """Swap a broken pool for a new one, unless another thread already did"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = _new_pool(layout)
+        broken.shutdown(wait=False, cancel_futures=True)
+        return _pool
+
+
+def submit(layout, fn, *args):
+    """Submit fn(*args) to the shared pool and return its future
+
+    A pool broken by a worker that died is replaced and the call retried
+    once on the new one.
+    """
+    pool = get_pool(layout)
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        return _replace_pool(pool, layout).submit(fn, *args)
+
+
+def resolve_logos(specs, companies=None):
+    """Return the (former, new) logos of every spec, all fetched concurrently
+
+    The lists share the logo store's fetch pool, so a cold batch is given
+    the logo deadline once for every round of lists the pool resolves at
+    once, rather than one deadline for the whole batch.
+    """
+    if not specs:
+        return []
+    domain_lists = []
+    for spec in specs:
+        domain_lists.append(engine.logo_domains(spec['former_company'], companies))
+        domain_lists.append(engine.logo_domains(spec['new_company'], companies))
+    _, layout = engine.layout_for(specs[0])
+    deadline = LOGO_DEADLINE * math.ceil(len(domain_lists) / LOGO_WORKERS)
+    logos = find_logos(domain_lists, size=layout['logo_size'], deadline=deadline)
+    return [tuple(logos[i:i + 2]) for i in range(0, len(logos), 2)]
+
+
+def when_done(futures, callback):
+    """Call callback() once every one of the futures has finished"""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def finished(future):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    for future in futures:
+        future.add_done_callback(finished)
+
+
+def render_item(index, spec, logos, quality=DEFAULT_QUALITY):
+    """Render one flyer of a batch to PNG bytes (runs in a worker process)"""
+    img = engine.render(spec, logos)
+    filename = f"{index:03d}_{spec['name'].replace(' ', '_')}_tech_transfer.png"
+    return index, filename, encode(img, 'png', quality)
+
+
+class ZipStream:
+    """Write-only buffer that lets a ZipFile be streamed chunk by chunk"""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
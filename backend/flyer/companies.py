@@ -0,0 +1,291 @@
+"""Indexed, hot-reloadable company directory
+
+A CompanyIndex is built once from the companies list and is read-only
+afterwards. It holds a case-insensitive name lookup, sorted name and word
+keys for prefix search, an n-gram index for substring and fuzzy search, and
+the fully serialized /api/companies body (plain and gzip-compressed) with a
+strong ETag, so serving the directory or resolving a company costs a dict
+lookup, a bisect or a few posting lists instead of a scan.
+Companies in the logo atlas carry their position in its sprite sheet.
+
+A CompanyDirectory watches companies.json and swaps in a rebuilt index when
+the file changes (or on SIGHUP), without a process restart.
+"""
+import bisect
+import difflib
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from collections import Counter
+
+from . import atlas
+
+logger = logging.getLogger(__name__)
+
+LOGO_URL = 'https://logo.clearbit.com/{domain}'
+CHECK_INTERVAL = float(os.environ.get('FLYER_COMPANIES_CHECK_INTERVAL', '2'))
+# Names sharing the most trigrams with a query that matched nothing are
+# ranked by difflib; the rest of the directory is never compared
+FUZZY_CANDIDATES = 50
+
+# Used when companies.json is missing
+FALLBACK_COMPANIES = [
+    {"name": "Google", "domain": "google.com"},
+    {"name": "Apple", "domain": "apple.com"},
+    {"name": "Microsoft", "domain": "microsoft.com"},
+    {"name": "Amazon", "domain": "amazon.com"},
+    {"name": "Meta", "domain": "meta.com"},
+    {"name": "Netflix", "domain": "netflix.com"},
+    {"name": "Airbnb", "domain": "airbnb.com"},
+    {"name": "Uber", "domain": "uber.com"},
+    {"name": "Spotify", "domain": "spotify.com"},
+    {"name": "Twitter", "domain": "twitter.com"}
+]
+
+
+def _normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def _ngrams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class CompanyIndex:
+    """Read-only lookup and search index over a list of companies"""
+
+    def __init__(self, companies):
+        entries = {}
+        for company in companies:
+            key = _normalize(company['name'])
+            if key and key not in entries:
+                entries[key] = {
+                    'name': company['name'],
+                    'domain': company['domain'],
+                    'logo': LOGO_URL.format(domain=company['domain'])
+                }
+                sprite = atlas.sprite_position(company['domain'])
+                if sprite:
+                    entries[key]['sprite'] = sprite
+        self.companies = sorted(entries.values(), key=lambda c: c['name'])
+        self._by_name = entries
+        self._keys = [_normalize(c['name']) for c in self.companies]
+
+        # Sorted (key, position) pairs for prefix search on the full name and
+        # on every word of it
+        self._names = sorted((key, i) for i, key in enumerate(self._keys))
+        self._words = sorted(
+            (word, i)
+            for i, key in enumerate(self._keys)
+            for word in set(key.split()[1:])
+        )
+
+        # Positions of the names containing each 1-, 2- and 3-gram. Trigrams
+        # are taken with a space around the name so its first and last
+        # letters weigh in fuzzy search as much as the middle ones.
+        postings = {}
+        for position, key in enumerate(self._keys):
+            for gram in _ngrams(key, 1) | _ngrams(key, 2) | _ngrams(f" {key} ", 3):
+                postings.setdefault(gram, []).append(position)
+        self._grams = {gram: tuple(positions) for gram, positions in postings.items()}
+
+        self.body = json.dumps({'companies': self.companies}, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+
+    def __len__(self):
+        return len(self.companies)
+
+    def lookup(self, name):
+        """Return the company with this name (case-insensitive), or None"""
+        if not name:
+            return None
+        return self._by_name.get(_normalize(name))
+
+    def domain_for(self, name):
+        """Return the domain of the company with this name, or None"""
+        company = self.lookup(name)
+        return company['domain'] if company else None
+
+    @staticmethod
+    def _prefix_matches(keys, prefix):
+        start = bisect.bisect_left(keys, (prefix,))
+        for key, position in keys[start:]:
+            if not key.startswith(prefix):
+                break
+            yield position
+
+    def search(self, query, offset=0, limit=20, fuzzy_cutoff=0.6):
+        """Return (total, page) of companies matching a typeahead query
+
+        Companies whose name starts with the query come first, then those
+        with a later word starting with it, then substring matches. When
+        nothing matches, close fuzzy matches among the FUZZY_CANDIDATES names
+        sharing the most trigrams with the query are returned instead.
+        """
+        query = _normalize(query)
+        if not query:
+            return len(self.companies), self.companies[offset:offset + limit]
+
+        positions = list(self._prefix_matches(self._names, query))
+        seen = set(positions)
+        for position in sorted(self._prefix_matches(self._words, query)):
+            if position not in seen:
+                seen.add(position)
+                positions.append(position)
+        positions.extend(sorted((position for position in self._substring_matches(query) if position not in seen),
+                                key=self._keys.__getitem__))
+
+        if not positions:
+            positions = self._fuzzy_matches(query, limit, fuzzy_cutoff)
+
+        return len(positions), [self.companies[p] for p in positions[offset:offset + limit]]
+
+    def _substring_matches(self, query):
+        """Yield the positions of the names containing a query
+
+        A query of up to three characters is a key of the index itself;
+        a longer one can only be in the names of the shortest posting list
+        of its trigrams, so only those are checked.
+        """
+        if len(query) <= 3:
+            yield from self._grams.get(query, ())
+            return
+        candidates = min((self._grams.get(trigram, ()) for trigram in _ngrams(query, 3)), key=len)
+        for position in candidates:
+            if query in self._keys[position]:
+                yield position
+
+    def _fuzzy_matches(self, query, limit, cutoff):
+        """Return the positions of the names closest to a query, best first"""
+        shared = Counter()
+        for trigram in _ngrams(f" {query} ", 3):
+            shared.update(self._grams.get(trigram, ()))
+        # Among names sharing as many trigrams, those closest in length to
+        # the query are the most similar
+        candidates = heapq.nlargest(FUZZY_CANDIDATES, shared, key=lambda position: (
+            shared[position], -abs(len(self._keys[position]) - len(query))))
+        by_key = {self._keys[position]: position for position in candidates}
+        return [by_key[key] for key in difflib.get_close_matches(query, by_key, n=limit, cutoff=cutoff)]
+
+
+def load_companies(path):
+    """Load the companies list from a JSON file"""
+    with open(path, 'r') as f:
+        return json.load(f)['companies']
+
+
+class CompanyDirectory:
+    """A CompanyIndex backed by a watched companies.json
+
+    The file's mtime is checked at most every check_interval seconds when the
+    index is accessed; a changed file is parsed, indexed and swapped in as a
+    whole, so readers always see one consistent index. A file that fails to
+    parse or disappears keeps the current index. Listeners are called with the old and new
+    index after every swap.
+    """
+
+    def __init__(self, path, fallback=FALLBACK_COMPANIES, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.fallback = fallback
+        self.check_interval = check_interval
+        self.version = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = 0.0
+        self._reload_requested = False
+        self._index = None
+        self.reload(force=True)
+
+    @property
+    def index(self):
+        """The current index, reloaded first if the file has changed"""
+        if self._reload_requested or time.monotonic() >= self._next_check:
+            self.reload()
+        return self._index
+
+    def add_listener(self, listener):
+        """Call listener(old_index, new_index) after each reload"""
+        self._listeners.append(listener)
+
+    def request_reload(self):
+        """Force a reload on the next access (safe to call from signal handlers)"""
+        self._reload_requested = True
+
+    def _read_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self, force=False):
+        """Rebuild the index if the file changed (or when forced)
+
+        Returns True when a new index was swapped in.
+        """
+        if not self._lock.acquire(blocking=self._index is None):
+            # Another thread is already reloading; keep serving the current index
+            return False
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            force = force or self._reload_requested
+            self._reload_requested = False
+            mtime = self._read_mtime()
+            if not force and mtime == self._mtime:
+                return False
+
+            if mtime is None:
+                if self._index is not None:
+                    # A file removed mid-deploy keeps the current directory
+                    return False
+                logger.warning("%s not found, using fallback data", self.path)
+                companies = self.fallback
+            else:
+                try:
+                    companies = load_companies(self.path)
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    logger.error("Invalid companies file %s: %s", self.path, e)
+                    if self._index is not None:
+                        # Not retried until the file changes again
+                        self._mtime = mtime
+                        return False
+                    companies = []
+            self._mtime = mtime
+
+            old_index, self._index = self._index, CompanyIndex(companies)
+            self.version += 1
+        finally:
+            self._lock.release()
+
+        if old_index is not None:
+            for listener in self._listeners:
+                try:
+                    listener(old_index, self._index)
+                except Exception:
+                    logger.exception("Company directory listener failed")
+        return True
+
+    def install_sighup_handler(self):
+        """Reload the directory on SIGHUP (main thread, POSIX only)"""
+        if not hasattr(signal, 'SIGHUP') or threading.current_thread() is not threading.main_thread():
+            return False
+        signal.signal(signal.SIGHUP, lambda signum, frame: self.request_reload())
+        return True
+
+
+def changed_domains(old_index, new_index):
+    """Return the domains of companies that were added, removed or re-pointed"""
+    old_domains = {key: c['domain'] for key, c in old_index._by_name.items()}
+    new_domains = {key: c['domain'] for key, c in new_index._by_name.items()}
+    domains = set()
+    for key in old_domains.keys() | new_domains.keys():
+        if old_domains.get(key) != new_domains.get(key):
+            domains.update(d for d in (old_domains.get(key), new_domains.get(key)) if d)
+    return domains
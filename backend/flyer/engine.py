@@ -0,0 +1,199 @@
+"""Flyer rendering engine
+
+render(spec) turns a flyer spec into an image. A spec is a dict holding the
+FIELDS strings, the profile image bytes under 'profile_image' and optionally
+the layout name under 'layout' and a resolution multiplier under 'scale'.
+render_presets() renders once and derives several social media sizes from
+the one image. Rendering does no network I/O: logos are
+resolved beforehand with resolve_logos() and passed in, and fonts and
+template layers are loaded once and then served from memory.
+"""
+import io
+import os
+
+from PIL import Image
+
+from . import metrics, render_cache
+from .background import get_layer, new_canvas, template_background_color, template_version
+from .fonts import digest as font_digest, prewarm as prewarm_font
+from .ingest import load_profile_image
+from .layouts import FONT, LAYOUTS
+from .logos import find_logos, guess_domains
+
+FIELDS = ('name', 'former_company', 'new_company', 'role', 'announcement_text', 'date')
+DEFAULT_LAYOUT = 'transfer-update'
+MAX_SCALE = float(os.environ.get('FLYER_MAX_SCALE', '3'))
+MIN_SCALE = 0.25
+# Requested scales are multiples of this, so only a few canvas sizes (and
+# template layers) ever exist
+SCALE_STEP = 0.25
+
+# Output sizes of the social media presets; the flyer is scaled to fit and
+# centered on the layout's background color. 'original' is the layout's
+# own 1x size.
+PRESETS = {
+    'original': None,
+    'linkedin': (1200, 1200),
+    'x': (1600, 900),
+    'instagram': (1080, 1350),
+}
+
+
+def layout_for(spec):
+    """Return the (name, layout) a spec renders with"""
+    name = spec.get('layout') or DEFAULT_LAYOUT
+    if name not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {name}")
+    return name, LAYOUTS[name]
+
+
+def layout_version(name=DEFAULT_LAYOUT):
+    """Return the version string identifying a layout's current design and fonts"""
+    return f"{name}:{template_version(name)}:{LAYOUTS[name]['version']}:{font_digest()[:12]}"
+
+
+def logo_domains(company_name, companies=None):
+    """Return candidate logo domains for a company, in priority order
+
+    Companies found in the companies index (a CompanyIndex) try their known
+    domain first, then the usual domain patterns.
+    """
+    domains = guess_domains(company_name)
+    known_domain = companies.domain_for(company_name) if companies is not None else None
+    if known_domain:
+        domains = [known_domain] + [d for d in domains if d != known_domain]
+    return domains
+
+
+def parse_scale(value):
+    """Validate a requested scale, a multiple of SCALE_STEP from MIN_SCALE to MAX_SCALE"""
+    if value is None or value == '':
+        return 1.0
+    try:
+        scale = float(value)
+    except ValueError:
+        raise ValueError('scale must be a number')
+    steps = scale / SCALE_STEP if MIN_SCALE <= scale <= MAX_SCALE else None
+    if steps is None or abs(steps - round(steps)) > 1e-9:
+        raise ValueError(f"scale must be a multiple of {SCALE_STEP:g} from {MIN_SCALE:g} to {MAX_SCALE:g}")
+    return round(steps) * SCALE_STEP
+
+
+def canvas_size(spec):
+    """Return the pixel size a spec renders at"""
+    _, layout = layout_for(spec)
+    scale = float(spec.get('scale', 1))
+    if not MIN_SCALE <= scale <= MAX_SCALE:
+        raise ValueError(f"scale must be from {MIN_SCALE:g} to {MAX_SCALE:g}")
+    width, height = layout['size']
+    return max(round(width * scale), 1), max(round(height * scale), 1)
+
+
+def _scaled(spec, value):
+    """Scale a 1x layout length to the spec's canvas, as the layouts do"""
+    _, layout = layout_for(spec)
+    return round(value * canvas_size(spec)[0] / layout['size'][0])
+
+
+def resolve_logos(spec, companies=None):
+    """Return the (former, new) company logos for a spec, fetched concurrently"""
+    _, layout = layout_for(spec)
+    with metrics.stage('logos'):
+        return tuple(find_logos([
+            logo_domains(spec['former_company'], companies),
+            logo_domains(spec['new_company'], companies)
+        ], size=_scaled(spec, layout['logo_size'])))
+
+
+def cache_key(spec, logos):
+    """Return the render cache key of a spec rendered with these logos"""
+    name, _ = layout_for(spec)
+    fields = {field: spec[field] for field in FIELDS}
+    size = canvas_size(spec)
+    if size != LAYOUTS[name]['size']:
+        fields['size'] = f"{size[0]}x{size[1]}"
+    return render_cache.make_key(fields, spec['profile_image'], layout_version(name),
+                                 [logo.info.get('digest') if logo else None for logo in logos])
+
+
+def render(spec, logos=(None, None)):
+    """Render a flyer spec and return the RGB image"""
+    name, layout = layout_for(spec)
+    with metrics.stage('background'):
+        img = new_canvas(name, canvas_size(spec))
+    with metrics.stage('profile'):
+        profile = load_profile_image(spec['profile_image'], _scaled(spec, layout['profile_size']))
+    with metrics.stage('draw'):
+        layout['draw'](img, spec, profile, logos)
+    return img
+
+
+def preset_size(name, preset):
+    """Return the output size of a preset for a layout"""
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset: {preset} (expected one of {', '.join(PRESETS)})")
+    return PRESETS[preset] or LAYOUTS[name]['size']
+
+
+def _fit(name, size):
+    """Return the size of the layout scaled to fit inside size"""
+    width, height = LAYOUTS[name]['size']
+    scale = min(size[0] / width, size[1] / height)
+    return round(width * scale), round(height * scale)
+
+
+def presets_scale(spec, presets):
+    """Return the scale to render a spec at so it covers every preset"""
+    name, layout = layout_for(spec)
+    return max(_fit(name, preset_size(name, preset))[0] for preset in presets) / layout['size'][0]
+
+
+def render_presets(spec, logos, presets):
+    """Render a spec once and return {preset: image} for each preset
+
+    spec['scale'] must be presets_scale(spec, presets) (logos resolved for
+    that spec). The flyer is downscaled from one preset to the next smaller
+    one, so each step is a small high-quality reduction, and centered on the
+    layout's background color when the preset's aspect ratio differs.
+    """
+    name, _ = layout_for(spec)
+    image = render(spec, logos)
+    background = template_background_color(name)
+
+    targets = sorted(((preset_size(name, preset), preset) for preset in presets),
+                     key=lambda target: _fit(name, target[0]), reverse=True)
+    outputs = {}
+    for size, preset in targets:
+        content_size = _fit(name, size)
+        if image.size != content_size:
+            with metrics.stage('resize'):
+                image = image.resize(content_size, Image.Resampling.LANCZOS)
+        if content_size == size:
+            outputs[preset] = image
+        else:
+            canvas = Image.new('RGB', size, background)
+            canvas.paste(image, ((size[0] - content_size[0]) // 2, (size[1] - content_size[1]) // 2))
+            outputs[preset] = canvas
+    return outputs
+
+
+def prewarm(name=DEFAULT_LAYOUT):
+    """Load a layout's fonts and static layers ahead of the first request"""
+    prewarm_font(FONT, LAYOUTS[name]['font_sizes'])
+    get_layer(name, LAYOUTS[name]['size'])
+
+
+def draw_sample(name=DEFAULT_LAYOUT):
+    """Draw a throwaway flyer at 1x without logos and return it
+
+    It goes through the steps render() does without recording stage
+    metrics, filling the caches only a real flyer reaches: circle masks,
+    text layouts and the image decoders.
+    """
+    layout = LAYOUTS[name]
+    photo = io.BytesIO()
+    Image.new('RGB', (layout['profile_size'],) * 2, (128, 128, 128)).save(photo, 'JPEG')
+    spec = {field: field.replace('_', ' ').title() for field in FIELDS}
+    img = new_canvas(name, layout['size'])
+    layout['draw'](img, spec, load_profile_image(photo.getvalue(), layout['profile_size']), (None, None))
+    return img
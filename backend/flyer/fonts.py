@@ -0,0 +1,238 @@
+"""Font registry memoizing FreeType faces per (face, size)
+
+Each registered face's TTF file is read once and kept in memory; faces are
+built per size on first use and held in a bounded LRU, so rendering a flyer
+does no font file I/O and no repeated face parsing.
+
+The flyer fonts are vendored under assets/fonts and listed with their SHA-256
+in its manifest.json; they are registered at import and never downloaded at
+runtime. `python -m flyer.fonts vendor` (run from backend/) fetches missing
+files and pins their hashes.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import urllib.request
+from collections import OrderedDict
+
+from PIL import ImageFont
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.environ.get('FLYER_FONT_CACHE_SIZE', '64'))
+FALLBACK_FONT = 'arial.ttf'
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'fonts')
+MANIFEST_PATH = os.path.join(ASSET_DIR, 'manifest.json')
+
+_sources = {}
+_checksums = {}
+_data = {}
+_fonts = OrderedDict()
+_lock = threading.RLock()
+_stats = {'hits': 0, 'misses': 0}
+_digest = None
+
+
+def register_font(face, source, sha256=None):
+    """Register a font face
+
+    source is a TTF path or a callable returning one (or None when the font
+    is unavailable); it is resolved lazily, once, on first use of the face.
+    With sha256, a file whose contents do not match is rejected; an empty
+    sha256 rejects any file.
+    """
+    global _digest
+    with _lock:
+        _sources[face] = source
+        _checksums[face] = sha256
+        _data.pop(face, None)
+        _digest = None
+        for key in [k for k in _fonts if k[0] == face]:
+            del _fonts[key]
+
+
+def _font_data(face):
+    """Return the TTF bytes of a registered face, or None"""
+    if face not in _data:
+        source = _sources[face]
+        path = source() if callable(source) else source
+        data = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                logger.warning("Failed to read %s font: %s", face, e)
+        else:
+            logger.warning("Font file for %s not found: %s", face, path)
+        expected = _checksums.get(face)
+        if data is not None and expected is not None:
+            if not expected:
+                logger.error("Rejecting %s font: no pinned SHA-256 (run `python -m flyer.fonts vendor`)", face)
+                data = None
+            elif hashlib.sha256(data).hexdigest() != expected:
+                logger.error("Rejecting %s font: %s does not match its SHA-256", face, path)
+                data = None
+        _data[face] = data
+    return _data[face]
+
+
+def _load(face, size):
+    if face in _sources:
+        data = _font_data(face)
+        if data is not None:
+            try:
+                return ImageFont.truetype(io.BytesIO(data), size)
+            except Exception:
+                logger.exception("Failed to load %s font", face)
+    else:
+        # Unregistered faces are looked up as system fonts
+        try:
+            return ImageFont.truetype(face, size)
+        except Exception:
+            pass
+
+    # Fallback to system fonts
+    try:
+        return ImageFont.truetype(FALLBACK_FONT, size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+def get_font(face, size):
+    """Return the font for a face and size, loading it on first use"""
+    key = (face, size)
+    with _lock:
+        font = _fonts.get(key)
+        if font is not None:
+            _fonts.move_to_end(key)
+            _stats['hits'] += 1
+            return font
+
+        _stats['misses'] += 1
+        font = _load(face, size)
+        _fonts[key] = font
+        while len(_fonts) > CACHE_SIZE:
+            _fonts.popitem(last=False)
+        return font
+
+
+def prewarm(face, sizes):
+    """Load a face at the given sizes ahead of the first request"""
+    for size in sizes:
+        get_font(face, size)
+
+
+def available(face):
+    """Return whether a registered face's file loaded and passed its check
+
+    Flyers drawn with an unavailable face use the fallback font.
+    """
+    with _lock:
+        return face in _sources and _font_data(face) is not None
+
+
+def digest():
+    """Return a digest of the font files the registered faces load
+
+    Faces that fall back to the default font count as missing, so anything
+    drawn with the fallback is keyed apart from the same drawing in the
+    real font.
+    """
+    global _digest
+    with _lock:
+        if _digest is None:
+            combined = hashlib.sha256()
+            for face in sorted(_sources):
+                data = _font_data(face)
+                combined.update(f"{face}:{hashlib.sha256(data).hexdigest() if data is not None else '-'}\n"
+                                .encode('utf-8'))
+            _digest = combined.hexdigest()
+        return _digest
+
+
+def cache_info():
+    """Return hit/miss counters and the number of cached fonts"""
+    with _lock:
+        return dict(_stats, size=len(_fonts), max_size=CACHE_SIZE)
+
+
+def clear_cache():
+    """Forget all loaded fonts and font file contents"""
+    global _digest
+    with _lock:
+        _fonts.clear()
+        _data.clear()
+        _digest = None
+
+
+def _read_manifest():
+    try:
+        with open(MANIFEST_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error("Failed to read font manifest: %s", e)
+        return {}
+
+
+def register_bundled_fonts():
+    """Register every face listed in the bundled font manifest
+
+    Faces without a pinned hash are registered but refused on load, so an
+    unverified file is never used.
+    """
+    for face, entry in _read_manifest().items():
+        register_font(face, os.path.join(ASSET_DIR, entry['file']), sha256=entry.get('sha256') or '')
+
+
+def vendor(manifest_path=MANIFEST_PATH):
+    """Download missing bundled fonts and pin their hashes in the manifest
+
+    Pinned hashes are checked, not replaced. Returns False if any font is
+    missing or does not match.
+    """
+    manifest = _read_manifest()
+    ok = True
+    for face, entry in manifest.items():
+        path = os.path.join(ASSET_DIR, entry['file'])
+        if not os.path.exists(path):
+            try:
+                with urllib.request.urlopen(entry['url'], timeout=30) as response:
+                    data = response.read()
+            except Exception as e:
+                logger.error("Failed to download %s font: %s", face, e)
+                ok = False
+                continue
+            if entry.get('sha256') and hashlib.sha256(data).hexdigest() != entry['sha256']:
+                logger.error("Downloaded %s font does not match its pinned SHA-256", face)
+                ok = False
+                continue
+            with open(path, 'wb') as f:
+                f.write(data)
+            logger.info("Downloaded %s font to %s", face, path)
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if not entry.get('sha256'):
+            entry['sha256'] = digest
+            logger.info("Pinned %s font: %s", face, digest)
+        elif entry['sha256'] != digest:
+            logger.error("%s does not match its pinned SHA-256", path)
+            ok = False
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    return ok
+
+
+register_bundled_fonts()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if sys.argv[1:] != ['vendor']:
+        sys.exit('usage: python -m flyer.fonts vendor')
+    sys.exit(0 if vendor() else 1)
@@ -0,0 +1,133 @@
+"""Profile image ingest: validation and memory-bounded decoding
+
+Uploads are checked against byte and pixel limits from their header alone,
+before anything is decoded. Decoding then asks the JPEG decoder for the
+smallest DCT scale that still covers the target size (draft mode) and uses
+reducing resamples for other formats, so a 24MP phone photo is never
+materialized at full resolution. EXIF orientation is applied and the picture
+is center-cropped to a square instead of being stretched.
+
+Streamed uploads are checked as they arrive with HeaderReader, which
+recognizes the format from the magic bytes and reads the dimensions from the
+header without decoding any pixels.
+"""
+import io
+import os
+
+from PIL import Image, ImageFile, ImageOps, UnidentifiedImageError
+
+MAX_BYTES = int(os.environ.get('FLYER_PROFILE_MAX_BYTES', str(15 * 1024 * 1024)))
+MAX_PIXELS = int(os.environ.get('FLYER_PROFILE_MAX_PIXELS', str(50_000_000)))
+# Give up on an upload whose header is not readable within this many bytes
+MAX_HEADER_BYTES = 256 * 1024
+
+# Leading bytes of the accepted formats (WebP is checked separately)
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+    (b'BM', 'BMP'),
+    (b'II*\x00', 'TIFF'),
+    (b'MM\x00*', 'TIFF'),
+)
+
+
+class ProfileImageError(ValueError):
+    """The upload is not an acceptable profile image"""
+    status_code = 400
+
+
+class ProfileImageTooLarge(ProfileImageError):
+    """The upload exceeds the configured byte or pixel limits"""
+    status_code = 413
+
+
+def sniff_format(head):
+    """Return the image format named by the leading bytes, or None"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    for signature, image_format in SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    return None
+
+
+def _check_size(size):
+    width, height = size
+    if width * height > MAX_PIXELS:
+        raise ProfileImageTooLarge(f"Profile image must be at most {MAX_PIXELS // 1_000_000} megapixels")
+
+
+def open_image(data):
+    """Open and validate profile image bytes without decoding the pixels"""
+    if len(data) > MAX_BYTES:
+        raise ProfileImageTooLarge(f"Profile image must be at most {MAX_BYTES // (1024 * 1024)} MB")
+    if not sniff_format(data[:16]):
+        raise ProfileImageError("Profile image must be a valid image file")
+    try:
+        img = Image.open(io.BytesIO(data))
+    except (UnidentifiedImageError, OSError):
+        raise ProfileImageError("Profile image must be a valid image file")
+    _check_size(img.size)
+    return img
+
+
+class HeaderReader:
+    """Validate a profile image from its first chunks as they are uploaded
+
+    feed() each chunk in order until it returns True; it raises
+    ProfileImageError as soon as the bytes cannot be an acceptable image.
+    """
+
+    def __init__(self):
+        self._parser = ImageFile.Parser()
+        self._head = b''
+        self.format = None
+        self.size = None
+
+    def feed(self, chunk):
+        """Feed the next chunk; returns True once the header has been validated"""
+        if self.size is not None:
+            return True
+        self._head += chunk
+        if len(self._head) < 16:
+            return False
+        if self.format is None:
+            self.format = sniff_format(self._head[:16])
+            if self.format is None:
+                raise ProfileImageError("Profile image must be a valid image file")
+            chunk = self._head
+        try:
+            self._parser.feed(chunk)
+        except Exception:
+            raise ProfileImageError("Profile image must be a valid image file")
+        if self._parser.image is None:
+            if len(self._head) > MAX_HEADER_BYTES:
+                raise ProfileImageError("Profile image must be a valid image file")
+            return False
+        # Stop here: the parser would start decoding pixels on the next feed
+        self.size = self._parser.image.size
+        self._parser = None
+        _check_size(self.size)
+        return True
+
+
+def load_profile_image(data, size):
+    """Decode profile image bytes into a size x size RGB square"""
+    img = open_image(data)
+
+    # Let the JPEG decoder downscale by up to 8x while decoding; draft picks
+    # the smallest scale that still covers the requested size
+    img.draft('RGB', (size, size))
+    img = ImageOps.exif_transpose(img)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Center-crop to a square and resize in one step
+    width, height = img.size
+    side = min(width, height)
+    left = (width - side) // 2
+    top = (height - side) // 2
+    return img.resize((size, size), Image.Resampling.LANCZOS,
+                      box=(left, top, left + side, top + side), reducing_gap=3.0)
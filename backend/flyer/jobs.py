@@ -0,0 +1,283 @@
+"""Background flyer jobs on a bounded worker pool
+
+A JobQueue runs submitted functions on a fixed number of worker threads fed
+by a bounded queue, so slow renders (mostly waiting on logo fetches) do not
+hold request threads. When the queue is full, submit() raises QueueFull and
+the caller should shed the request.
+
+Job records (status, timestamps, result or error) live in a job store: in
+memory by default, or in a SQLite database at JOBS_DB so every worker
+process of a server can answer polls for jobs queued by the others. Finished
+jobs are forgotten after JOB_TTL. A job can carry a callback URL that is
+POSTed the finished record from a separate pool of threads, so a slow
+callback never holds a render worker. Unless CALLBACK_HOSTS lists the hosts
+callbacks may go to, a callback URL must resolve to public addresses only.
+
+Jobs only run while the process is alive, so async mode needs a long-running
+server; serverless functions may be frozen as soon as the response is sent.
+"""
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get('FLYER_JOB_WORKERS', '4'))
+MAX_PENDING = int(os.environ.get('FLYER_JOB_QUEUE_SIZE', '100'))
+JOB_TTL = int(os.environ.get('FLYER_JOB_TTL', '3600'))
+JOBS_DB = os.environ.get('FLYER_JOBS_DB', '')
+CALLBACK_HOSTS = {host.strip().lower() for host in os.environ.get('FLYER_JOB_CALLBACK_HOSTS', '').split(',')
+                  if host.strip()}
+CALLBACK_TIMEOUT = float(os.environ.get('FLYER_JOB_CALLBACK_TIMEOUT', '5'))
+CALLBACK_WORKERS = int(os.environ.get('FLYER_JOB_CALLBACK_WORKERS', '2'))
+CALLBACK_RETRIES = 2
+
+
+class QueueFull(Exception):
+    """The job queue is at capacity"""
+    def __init__(self, retry_after):
+        super().__init__('Too many flyers queued, try again later')
+        self.retry_after = retry_after
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def validate_callback_url(url):
+    """Raise ValueError unless url is an acceptable job callback
+
+    With CALLBACK_HOSTS, the host must be one of them. Otherwise every
+    address it resolves to must be public, so a callback cannot reach
+    loopback, private, link-local (cloud metadata) or other internal
+    addresses.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError('callback_url must be an http or https URL')
+    host = parts.hostname.lower()
+    if CALLBACK_HOSTS:
+        if host not in CALLBACK_HOSTS:
+            raise ValueError(f"callback_url host {host} is not allowed")
+        return
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host {host} does not resolve")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"callback_url host {host} is not a public address")
+
+
+class MemoryJobStore:
+    """Job records held in this process"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def put(self, job):
+        with self._lock:
+            self._jobs[job['id']] = (time.time(), dict(job))
+
+    def get(self, job_id):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        return dict(entry[1]) if entry else None
+
+    def purge(self, before):
+        """Forget finished jobs last updated before the given time"""
+        with self._lock:
+            expired = [job_id for job_id, (updated, job) in self._jobs.items()
+                       if updated < before and job['status'] in ('succeeded', 'failed')]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Job records in a SQLite database shared by the server's processes"""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS jobs '
+                       '(id TEXT PRIMARY KEY, status TEXT, updated REAL, record TEXT)')
+
+    def _connect(self):
+        # One short-lived connection per call keeps the store usable from any thread
+        return sqlite3.connect(self.path, timeout=10)
+
+    def put(self, job):
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)',
+                       (job['id'], job['status'], time.time(), json.dumps(job)))
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute('SELECT record FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge(self, before):
+        """Forget finished jobs last updated before the given time"""
+        with self._connect() as db:
+            db.execute("DELETE FROM jobs WHERE updated < ? AND status IN ('succeeded', 'failed')", (before,))
+
+
+def default_store():
+    """Return the job store configured by FLYER_JOBS_DB"""
+    return SQLiteJobStore(JOBS_DB) if JOBS_DB else MemoryJobStore()
+
+
+class JobQueue:
+    """A bounded queue of jobs run by a fixed pool of worker threads
+
+    Workers are started on the first submit in each process, so a queue
+    created before a server forks its workers is safe to share.
+    """
+
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING, store=None, ttl=JOB_TTL):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.store = store or default_store()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._callbacks = None
+        self._running = 0
+        self._stats = {'submitted': 0, 'succeeded': 0, 'failed': 0, 'rejected': 0,
+                       'wait_seconds': 0.0, 'run_seconds': 0.0}
+
+    def _ensure_workers(self):
+        """Start the worker threads in this process if they are not running"""
+        with self._lock:
+            # A queue created before the server forked is copied into every
+            # worker without its threads; each worker gets its own queue,
+            # job threads and callback pool on its first submit
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.max_pending)
+            self._callbacks = ThreadPoolExecutor(max_workers=CALLBACK_WORKERS, thread_name_prefix='flyer-callback')
+            self._running = 0
+            for i in range(self.workers):
+                threading.Thread(target=self._work, name=f"flyer-job-{i}", daemon=True).start()
+
+    def retry_after(self):
+        """Return the seconds a rejected client should wait before retrying"""
+        with self._lock:
+            finished = self._stats['succeeded'] + self._stats['failed']
+            mean_run = self._stats['run_seconds'] / finished if finished else 1.0
+        depth = self._queue.qsize() if self._queue else 0
+        return max(1, round(mean_run * depth / max(self.workers, 1)))
+
+    def submit(self, fn, callback_url=None):
+        """Queue fn() and return the new job record
+
+        fn returns the job's result, a JSON-serializable dict. Raises
+        QueueFull when max_pending jobs are already waiting.
+        """
+        self._ensure_workers()
+        if self._queue.full():
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise QueueFull(self.retry_after())
+        job = {'id': uuid.uuid4().hex, 'status': 'queued', 'created_at': _now(),
+               'started_at': None, 'finished_at': None, 'result': None, 'error': None}
+        self.store.put(job)
+        record = dict(job)
+        try:
+            self._queue.put_nowait((job, fn, callback_url, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._stats['rejected'] += 1
+            job.update(status='failed', error='rejected', finished_at=_now())
+            self.store.put(job)
+            raise QueueFull(self.retry_after())
+        with self._lock:
+            self._stats['submitted'] += 1
+        self.store.purge(time.time() - self.ttl)
+        return record
+
+    def get(self, job_id):
+        """Return a job record, or None for unknown or expired jobs"""
+        return self.store.get(job_id)
+
+    def _work(self):
+        while True:
+            job, fn, callback_url, queued_at = self._queue.get()
+            started = time.monotonic()
+            with self._lock:
+                self._running += 1
+            job.update(status='running', started_at=_now())
+            self._save(job)
+            try:
+                job.update(status='succeeded', result=fn())
+            except Exception as e:
+                job.update(status='failed', error=str(e))
+            job['finished_at'] = _now()
+            self._save(job)
+
+            with self._lock:
+                self._running -= 1
+                self._stats[job['status']] += 1
+                self._stats['wait_seconds'] += started - queued_at
+                self._stats['run_seconds'] += time.monotonic() - started
+            if callback_url:
+                self._callbacks.submit(self._notify, callback_url, dict(job))
+
+    def _save(self, job):
+        try:
+            self.store.put(job)
+        except Exception as e:
+            logger.warning("Failed to store job %s: %s", job['id'], e)
+
+    def _notify(self, url, job):
+        """POST the finished job record to its callback URL, with retries"""
+        for attempt in range(CALLBACK_RETRIES + 1):
+            try:
+                # The host may resolve elsewhere by now; redirects are not
+                # followed, as their target was never checked
+                validate_callback_url(url)
+                response = requests.post(url, json=job, timeout=CALLBACK_TIMEOUT, allow_redirects=False)
+                if response.status_code < 500:
+                    return
+            except ValueError as e:
+                logger.warning("Job %s: callback to %s refused: %s", job['id'], url, e)
+                return
+            except requests.RequestException:
+                pass
+            if attempt < CALLBACK_RETRIES:
+                time.sleep(2 ** attempt)
+        logger.warning("Job %s: callback to %s failed", job['id'], url)
+
+    def stats(self):
+        """Return queue depth, running jobs, outcome counters and mean wait/run times"""
+        with self._lock:
+            finished = self._stats['succeeded'] + self._stats['failed']
+            return {
+                'queue_depth': self._queue.qsize() if self._queue else 0,
+                'running': self._running,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'submitted': self._stats['submitted'],
+                'succeeded': self._stats['succeeded'],
+                'failed': self._stats['failed'],
+                'rejected': self._stats['rejected'],
+                'mean_wait_ms': round(self._stats['wait_seconds'] * 1000 / finished, 2) if finished else 0.0,
+                'mean_run_ms': round(self._stats['run_seconds'] * 1000 / finished, 2) if finished else 0.0,
+            }
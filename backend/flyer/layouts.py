@@ -0,0 +1,289 @@
+"""Flyer layouts
+
+A layout pairs a template painter (the static layers, see background) with a
+draw function that adds the request data: profile picture, names, companies
+and logos. Draw functions only touch the canvas they are given; everything
+they need (decoded profile picture, resolved logos) is passed in.
+
+transfer-update is the design served by the Flask backend;
+tech-transfer-announcement is the one served by the serverless API.
+
+Layouts are designed at their base size; every coordinate, font size and
+stroke is multiplied by the canvas scale (canvas width / base width), so the
+same layout renders at any resolution.
+
+Request text is laid out with text.fit(): names, companies and
+announcements shrink (and announcements wrap) to stay on the canvas, and
+are cut short with an ellipsis when even the smallest size is too wide.
+"""
+import logging
+
+from PIL import ImageDraw
+
+from . import metrics, text
+from .background import register_template, draw_circuit_board
+from .fonts import get_font
+from .masks import circle_mask, filled_circle
+
+logger = logging.getLogger(__name__)
+
+GOLDEN_COLOR = (255, 215, 0)
+FONT = 'LilitaOne'
+
+LAYOUTS = {}
+
+
+def register_layout(name, painter, draw, size, profile_size, logo_size, font_sizes, version=1):
+    """Register a layout
+
+    size, profile_size, logo_size and font_sizes are at 1x scale. version
+    covers the draw function and is combined with the template version; bump
+    it whenever the draw output changes.
+    """
+    register_template(name, painter, version=version)
+    LAYOUTS[name] = {
+        'draw': draw,
+        'size': size,
+        'profile_size': profile_size,
+        'logo_size': logo_size,
+        'font_sizes': font_sizes,
+        'version': version,
+    }
+
+
+def canvas_scale(img, name):
+    """Return the scale of a layout's canvas relative to its 1x size"""
+    return img.width / LAYOUTS[name]['size'][0]
+
+
+def scaler(scale):
+    """Return a function converting 1x layout units to pixels at a scale"""
+    def S(value):
+        return round(value * scale)
+    return S
+
+
+def _centered_x(draw, text, font, width):
+    bbox = draw.textbbox((0, 0), text, font=font)
+    return (width - (bbox[2] - bbox[0])) // 2
+
+
+def _draw_fitted(draw, layout, y, fill, align):
+    """Draw a text.fit() layout one line below the other
+
+    align(line_width) returns the x of each line. Text shrunk onto one line
+    stays centered on the line it was designed for.
+    """
+    font = get_font(layout['face'], layout['size'])
+    if len(layout['lines']) == 1:
+        y += (layout['max_size'] - layout['size']) // 2
+    for line, line_width in layout['lines']:
+        draw.text((align(line_width), y), line, fill=fill, font=font)
+        y += layout['line_height']
+
+
+def _centered(width):
+    return lambda line_width: (width - line_width) // 2
+
+
+def _draw_arrow(draw, x, y, width, fill, S):
+    """Draw a right-pointing arrow width pixels long, centered on y
+
+    It is drawn as shapes since neither the flyer font nor the usual
+    fallbacks have an arrow glyph.
+    """
+    head = S(12)
+    draw.rectangle([x, y - S(2), x + width - head, y + S(2)], fill=fill)
+    draw.polygon([(x + width - head, y - S(10)), (x + width, y), (x + width - head, y + S(10))], fill=fill)
+
+
+# transfer-update
+
+PROFILE_SIZE = 360
+PROFILE_BORDER = 10
+PROFILE_Y = 80
+
+
+def paint_transfer_update(img, draw):
+    """Draw the circuit board background, "TRANSFER UPDATE" header and profile border"""
+    width, height = img.size
+    scale = canvas_scale(img, 'transfer-update')
+    S = scaler(scale)
+    draw_circuit_board(draw, width, height, scale=scale)
+
+    header_text = "TRANSFER UPDATE"
+    header_font = get_font(FONT, S(36))
+    draw.text((_centered_x(draw, header_text, header_font, width), S(20)), header_text,
+              fill=GOLDEN_COLOR, font=header_font)
+
+    # Golden border behind the profile image
+    border = filled_circle(S(PROFILE_SIZE) + 2 * S(PROFILE_BORDER), GOLDEN_COLOR)
+    img.paste(border, (width // 2 - border.width // 2, S(PROFILE_Y)), border)
+
+
+def draw_transfer_update(img, spec, profile, logos):
+    """Draw the profile picture, company banner, name and announcement"""
+    width, height = img.size
+    scale = canvas_scale(img, 'transfer-update')
+    S = scaler(scale)
+    draw = ImageDraw.Draw(img)
+    name_font = get_font(FONT, S(70))
+    announcement_font = get_font(FONT, S(56))
+
+    # The golden border is part of the template
+    profile_size = S(PROFILE_SIZE)
+    img.paste(profile, (width // 2 - profile_size // 2, S(PROFILE_Y) + S(PROFILE_BORDER)), circle_mask(profile_size))
+
+    name = spec['name']
+    former_company = spec['former_company']
+    new_company = spec['new_company']
+    announcement_text = spec['announcement_text']
+
+    # Company transition banner below the profile image
+    company_y = S(480)
+    banner_height = S(120)
+    banner_color = (229, 231, 235)  # Light gray banner
+
+    try:
+        draw.rectangle([S(50), company_y - S(40), width - S(50), company_y + banner_height - S(40)], fill=banner_color)
+
+        former_logo, new_logo = logos
+        logo_size = S(LAYOUTS['transfer-update']['logo_size'])
+
+        # Logos and names in the banner, centered around the arrow
+        logo_y = company_y + S(5)
+        logo_text_gap = S(15)
+
+        arrow_width = S(30)
+
+        # Room for both names inside the banner; a short name leaves its
+        # share to the other one
+        text_room = (width - S(120) - arrow_width - S(60)
+                     - sum(logo_size + logo_text_gap for logo in logos if logo))
+        former_layout = text.fit(former_company, FONT, S(34), max(
+            text_room // 2, text_room - text.text_width(new_company, FONT, S(34))), min_size=S(22))
+        former_text_width = former_layout['lines'][0][1]
+        new_layout = text.fit(new_company, FONT, S(34), text_room - former_text_width, min_size=S(22))
+        new_text_width = new_layout['lines'][0][1]
+
+        former_section_width = (logo_size + logo_text_gap if former_logo else 0) + former_text_width
+        new_section_width = (logo_size + logo_text_gap if new_logo else 0) + new_text_width
+
+        total_width = former_section_width + arrow_width + new_section_width + S(60)  # 60 for spacing
+        current_x = (width - total_width) // 2
+
+        # Former company (left side)
+        if former_logo:
+            img.paste(former_logo, (current_x, logo_y), former_logo if former_logo.mode == 'RGBA' else None)
+            current_x += logo_size + logo_text_gap
+        _draw_fitted(draw, former_layout, logo_y + S(12), (0, 0, 0), lambda line_width, x=current_x: x)
+        current_x += former_text_width + S(30)
+
+        # Arrow in center, level with the company names
+        _draw_arrow(draw, current_x, logo_y + S(30), arrow_width, (0, 0, 0), S)
+        current_x += arrow_width + S(30)
+
+        # New company (right side)
+        if new_logo:
+            img.paste(new_logo, (current_x, logo_y), new_logo if new_logo.mode == 'RGBA' else None)
+            current_x += logo_size + logo_text_gap
+        _draw_fitted(draw, new_layout, logo_y + S(12), (0, 0, 0), lambda line_width, x=current_x: x)
+
+        # Name and announcement in golden text; the announcement may take
+        # two lines above the bottom edge
+        max_width = width - 2 * S(MARGIN)
+        _draw_fitted(draw, text.fit(name.upper(), FONT, S(70), max_width, min_size=S(40)), S(620),
+                     GOLDEN_COLOR, _centered(width))
+        _draw_fitted(draw, text.fit(announcement_text, FONT, S(56), max_width, min_size=S(32), max_lines=2),
+                     S(710), GOLDEN_COLOR, _centered(width))
+
+    except Exception:
+        logger.exception("Error adding text")
+        metrics.inc('flyer_errors_total', {'stage': 'text'})
+        # Fallback text with golden color
+        draw.text((width//2 - S(200), S(20)), "TRANSFER WINDATE UPDATE", fill=GOLDEN_COLOR, font=get_font(FONT, S(36)))
+        draw.text((width//2 - S(150), S(620)), name.upper(), fill=GOLDEN_COLOR, font=name_font)
+        draw.text((width//2 - S(100), S(710)), announcement_text, fill=GOLDEN_COLOR, font=announcement_font)
+
+
+register_layout('transfer-update', paint_transfer_update, draw_transfer_update, size=(800, 900),
+                profile_size=PROFILE_SIZE, logo_size=48, font_sizes=[34, 36, 56, 70], version=4)
+
+
+# tech-transfer-announcement
+
+ANNOUNCEMENT_PROFILE_SIZE = 200
+ANNOUNCEMENT_PROFILE_Y = 100
+COMPANIES_Y = 420
+# The company arrow spans ARROW_HALF_WIDTH either side of the center; names
+# keep ARROW_GAP clear of it and MARGIN clear of the canvas edges
+ARROW_HALF_WIDTH = 60
+ARROW_GAP = 20
+MARGIN = 40
+
+
+def paint_tech_transfer_announcement(img, draw):
+    """Draw the circuit board, header, profile backdrop and company arrow"""
+    width, height = img.size
+    scale = canvas_scale(img, 'tech-transfer-announcement')
+    S = scaler(scale)
+    draw_circuit_board(draw, width, height, diagonals=False, scale=scale)
+
+    header_font = get_font(FONT, S(36))
+    header_text = "TECH TRANSFER ANNOUNCEMENT"
+    draw.text((_centered_x(draw, header_text, header_font, width), S(40)), header_text,
+              font=header_font, fill=GOLDEN_COLOR)
+
+    # Background circle behind the profile image
+    profile_size = S(ANNOUNCEMENT_PROFILE_SIZE)
+    bg_circle = filled_circle(profile_size + S(20), (255, 255, 255))
+    img.paste(bg_circle, ((width - profile_size) // 2 - S(10), S(ANNOUNCEMENT_PROFILE_Y) - S(10)), bg_circle)
+
+    # Arrow between the companies
+    arrow_y = S(COMPANIES_Y) + S(40)
+    arrow_start_x = width // 2 - S(ARROW_HALF_WIDTH)
+    arrow_end_x = width // 2 + S(ARROW_HALF_WIDTH)
+    draw.line([(arrow_start_x, arrow_y), (arrow_end_x, arrow_y)], fill=GOLDEN_COLOR, width=S(8))
+    draw.polygon([(arrow_end_x, arrow_y), (arrow_end_x - S(20), arrow_y - S(10)), (arrow_end_x - S(20), arrow_y + S(10))],
+                 fill=GOLDEN_COLOR)
+
+
+def draw_tech_transfer_announcement(img, spec, profile, logos):
+    """Draw the profile picture, name, companies, announcement, role and date"""
+    width, height = img.size
+    scale = canvas_scale(img, 'tech-transfer-announcement')
+    S = scaler(scale)
+    draw = ImageDraw.Draw(img)
+    max_width = width - 2 * S(MARGIN)
+
+    profile_size = S(ANNOUNCEMENT_PROFILE_SIZE)
+    img.paste(profile, ((width - profile_size) // 2, S(ANNOUNCEMENT_PROFILE_Y)), circle_mask(profile_size))
+
+    _draw_fitted(draw, text.fit(spec['name'].upper(), FONT, S(70), max_width, min_size=S(40)), S(320),
+                 (255, 255, 255), _centered(width))
+
+    # Companies, each centered between the canvas edge and the arrow with
+    # the logo above the name
+    arrow_clearance = S(ARROW_HALF_WIDTH) + S(ARROW_GAP)
+    span_width = width // 2 - arrow_clearance - S(MARGIN)
+    for company, logo, left in ((spec['former_company'], logos[0], S(MARGIN)),
+                                (spec['new_company'], logos[1], width // 2 + arrow_clearance)):
+        center_x = left + span_width // 2
+        text_y = S(COMPANIES_Y)
+        if logo:
+            img.paste(logo, (center_x - logo.width // 2, S(COMPANIES_Y)), logo)
+            text_y += S(90)
+        _draw_fitted(draw, text.fit(company, FONT, S(60), span_width, min_size=S(28)), text_y,
+                     (255, 255, 255), lambda line_width, x=center_x: x - line_width // 2)
+
+    _draw_fitted(draw, text.fit(spec['announcement_text'], FONT, S(56), max_width, min_size=S(32)), S(620),
+                 GOLDEN_COLOR, _centered(width))
+    _draw_fitted(draw, text.fit(spec['role'].upper(), FONT, S(54), max_width, min_size=S(30)), S(700),
+                 (255, 255, 255), _centered(width))
+    _draw_fitted(draw, text.fit(f"Effective: {spec['date']}", FONT, S(36), max_width, min_size=S(24)), S(800),
+                 (200, 200, 200), _centered(width))
+
+
+register_layout('tech-transfer-announcement', paint_tech_transfer_announcement, draw_tech_transfer_announcement,
+                size=(800, 900), profile_size=ANNOUNCEMENT_PROFILE_SIZE, logo_size=80,
+                font_sizes=[36, 54, 56, 60, 70], version=4)
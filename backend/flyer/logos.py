@@ -0,0 +1,447 @@
+"""Company logo store with memory, disk and negative caching
+
+Logos are fetched from the Clearbit logo API at most once per TTL. Fetched
+images are stored on disk content-addressed by their bytes, with a small
+per-domain record pointing at them; decoded, pre-resized RGBA copies are kept
+in a bounded in-memory LRU. Domains that answer 404 or 410 are remembered as
+missing for a shorter TTL so they are not retried on every flyer; other
+failures are not cached. Expired records are deleted when read, and once
+there are more than DISK_RECORDS of them a sweep deletes the expired ones,
+then those expiring soonest down to a low-water mark, then the blobs no
+record points at.
+
+Domains in the logo atlas (see atlas) are answered from it before any of
+these tiers. Uncached domains are fetched concurrently on a shared, bounded thread pool
+with a pooled HTTP session, under an overall deadline. Concurrent lookups of
+the same uncached domain share one disk read and one logo API request.
+
+LOGO_BASE_URL can point at a local stub server for testing.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+from . import atlas, metrics, singleflight
+
+logger = logging.getLogger(__name__)
+
+LOGO_BASE_URL = os.environ.get('FLYER_LOGO_BASE_URL', 'https://logo.clearbit.com')
+CACHE_DIR = os.environ.get('FLYER_LOGO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'flyer-logos'))
+TTL = int(os.environ.get('FLYER_LOGO_TTL', str(7 * 24 * 3600)))
+NEGATIVE_TTL = int(os.environ.get('FLYER_LOGO_NEGATIVE_TTL', '3600'))
+MEMORY_SIZE = int(os.environ.get('FLYER_LOGO_MEMORY_SIZE', '256'))
+DISK_RECORDS = int(os.environ.get('FLYER_LOGO_DISK_RECORDS', '20000'))
+# Share of DISK_RECORDS the disk tier is trimmed to once it outgrows it
+DISK_LOW_WATER = float(os.environ.get('FLYER_LOGO_DISK_LOW_WATER', '0.9'))
+# Seconds an unreferenced blob is kept, since its record may not be written yet
+BLOB_GRACE = 60
+MAX_WORKERS = int(os.environ.get('FLYER_LOGO_WORKERS', '8'))
+DEADLINE = float(os.environ.get('FLYER_LOGO_DEADLINE', '6'))
+LOGO_SIZE = 48
+# Responses cached as "no logo" for NEGATIVE_TTL; any other failure is retried
+MISSING_STATUSES = (404, 410)
+
+_memory = OrderedDict()
+_disk_records = None
+_stats = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'atlas_hits': 0, 'fetches': 0}
+
+
+def _init_workers():
+    """Create the fetch pool, HTTP session, locks and in-flight lookups"""
+    global _session, _executor, _lock, _sweep_lock, _flights
+    _session = requests.Session()
+    _session.mount('https://', HTTPAdapter(pool_maxsize=MAX_WORKERS))
+    _session.mount('http://', HTTPAdapter(pool_maxsize=MAX_WORKERS))
+    _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='logo-fetch')
+    _lock = threading.Lock()
+    _sweep_lock = threading.Lock()
+    _flights = singleflight.Group()
+
+
+_init_workers()
+# Forked processes inherit the pool without its threads (and possibly a held
+# lock), so they get fresh ones; cached logos are kept
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_init_workers)
+
+
+def guess_domains(company_name):
+    """Return likely domains for a company that is not in the directory"""
+    base = company_name.lower()
+    domains = [
+        f"{base.replace(' ', '').replace('.', '').replace('-', '')}.com",
+        f"{base.replace(' ', '-').replace('.', '').replace('_', '-')}.com",
+        f"{base.replace(' ', '').replace('.', '').replace('-', '')}.io"
+    ]
+    return list(dict.fromkeys(domains))
+
+
+def _record_path(domain):
+    key = hashlib.sha1(domain.encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, 'domains', f"{key}.json")
+
+
+def _blob_path(digest):
+    return os.path.join(CACHE_DIR, 'blobs', digest[:2], digest)
+
+
+def _read_record(domain):
+    """Return the unexpired disk record for a domain, or None"""
+    if not CACHE_DIR:
+        return None
+    path = _record_path(domain)
+    try:
+        with open(path, 'r') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record.get('expires', 0) < time.time():
+        _remove(path)
+        return None
+    return record
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_record(domain, digest, ttl):
+    """Persist a domain record; digest None marks a known-missing logo"""
+    global _disk_records
+    if not CACHE_DIR:
+        return
+    record = {'domain': domain, 'digest': digest, 'expires': time.time() + ttl}
+    try:
+        _write_file(_record_path(domain), json.dumps(record).encode('utf-8'))
+    except OSError as e:
+        logger.warning("Failed to cache logo record for %s: %s", domain, e)
+        return
+    # Rewrites of a record are counted too; the next sweep recounts
+    with _lock:
+        if _disk_records is not None:
+            _disk_records += 1
+        over_quota = _disk_records is None or _disk_records > DISK_RECORDS
+    if over_quota:
+        sweep()
+
+
+def _store_blob(content):
+    """Store logo bytes content-addressed and return their digest"""
+    digest = hashlib.sha256(content).hexdigest()
+    if CACHE_DIR:
+        path = _blob_path(digest)
+        try:
+            # A blob already stored is touched so a sweep racing the record
+            # about to point at it treats it as new
+            os.utime(path)
+        except OSError:
+            try:
+                _write_file(path, content)
+            except OSError as e:
+                logger.warning("Failed to cache logo blob %s: %s", digest, e)
+    return digest
+
+
+def _scan(directory):
+    """Return (path, mtime) of the files under a directory of the disk tier"""
+    entries = []
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            path = os.path.join(root, filename)
+            try:
+                entries.append((path, os.stat(path).st_mtime))
+            except OSError:
+                continue
+    return entries
+
+
+def sweep():
+    """Delete expired records, those past the low-water mark and unreferenced blobs
+
+    Records are deleted from the soonest to expire once there are more than
+    DISK_RECORDS. Scans without holding _lock, so lookups are not held up;
+    returns the number of records kept, or None if another thread is
+    already sweeping.
+    """
+    global _disk_records
+    if not CACHE_DIR or not _sweep_lock.acquire(blocking=False):
+        return None
+    try:
+        started = time.time()
+        records = []
+        for path, mtime in _scan(os.path.join(CACHE_DIR, 'domains')):
+            try:
+                with open(path, 'r') as f:
+                    record = json.load(f)
+                expires = record['expires']
+            except OSError:
+                continue
+            except (ValueError, KeyError, TypeError):
+                # Records are replaced atomically, so this one is corrupt,
+                # or a temporary file left by a crashed writer
+                if mtime < started - BLOB_GRACE:
+                    _remove(path)
+                continue
+            if expires < started:
+                _remove(path)
+            else:
+                records.append((expires, path, record.get('digest')))
+
+        records.sort()
+        target = int(DISK_RECORDS * DISK_LOW_WATER) if len(records) > DISK_RECORDS else len(records)
+        for _, path, _ in records[:len(records) - target]:
+            _remove(path)
+        kept = records[len(records) - target:]
+
+        referenced = {digest for _, _, digest in kept if digest}
+        for path, mtime in _scan(os.path.join(CACHE_DIR, 'blobs')):
+            if os.path.basename(path) not in referenced and mtime < started - BLOB_GRACE:
+                _remove(path)
+
+        # Records written during the scan are picked up by the next one
+        with _lock:
+            _disk_records = len(kept)
+        return len(kept)
+    finally:
+        _sweep_lock.release()
+
+
+def _load_blob(digest):
+    try:
+        with open(_blob_path(digest), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _decode(content, size, digest):
+    """Decode logo bytes into a square RGBA image of the given size
+
+    The digest of the source bytes is kept in the image's info['digest'].
+    """
+    logo_img = Image.open(io.BytesIO(content))
+    logo_img = logo_img.convert('RGBA')
+    logo_img = logo_img.resize((size, size), Image.Resampling.LANCZOS)
+    logo_img.info['digest'] = digest
+    return logo_img
+
+
+def _remember(key, logo, ttl):
+    with _lock:
+        _memory[key] = (time.time() + ttl, logo)
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_SIZE:
+            _memory.popitem(last=False)
+
+
+def _fetch(domain, timeout):
+    """Fetch logo bytes from the logo API
+
+    Returns (content, cacheable): content is None when there is no logo, and
+    cacheable is False for transient failures that should be retried.
+    """
+    with _lock:
+        _stats['fetches'] += 1
+    start = time.perf_counter()
+    try:
+        response = _session.get(f"{LOGO_BASE_URL}/{domain}", timeout=timeout)
+    except requests.RequestException as e:
+        metrics.observe('flyer_logo_fetch_seconds', time.perf_counter() - start, {'outcome': 'error'})
+        logger.warning("Error fetching logo for %s: %s", domain, e)
+        return None, False
+    if response.status_code == 200:
+        outcome = 'found'
+    elif response.status_code in MISSING_STATUSES:
+        outcome = 'missing'
+    else:
+        outcome = 'error'
+    metrics.observe('flyer_logo_fetch_seconds', time.perf_counter() - start, {'outcome': outcome})
+    if response.status_code == 200:
+        return response.content, True
+    # Only "not found" means the API has no logo for this domain; rate
+    # limits, timeouts and 5xx may recover
+    return None, response.status_code in MISSING_STATUSES
+
+
+def _local_logo(domain, size):
+    """Return (found, logo) from memory or the atlas, without any I/O"""
+    key = (domain, size)
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None and entry[0] >= time.time():
+            _memory.move_to_end(key)
+            if entry[1] is None:
+                _stats['negative_hits'] += 1
+            else:
+                _stats['hits'] += 1
+            return True, entry[1]
+
+    known, logo = atlas.lookup(domain, size)
+    if not known:
+        return False, None
+    with _lock:
+        _stats['atlas_hits'] += 1
+    _remember(key, logo, TTL)
+    return True, logo
+
+
+def get_logo(domain, timeout=5, size=LOGO_SIZE):
+    """Return the RGBA logo for a domain, or None if it has none
+
+    The returned image is shared between requests and must not be modified.
+    """
+    found, logo = _local_logo(domain, size)
+    if found:
+        return logo
+    with _lock:
+        _stats['misses'] += 1
+    # Requests for the same logo arriving together share one lookup
+    return _flights.do((domain, size), lambda: _load(domain, timeout, size))
+
+
+def _load(domain, timeout, size):
+    """Return the logo for a domain from disk or the logo API, caching it"""
+    key = (domain, size)
+    now = time.time()
+    record = _read_record(domain)
+    if record is not None:
+        ttl = record['expires'] - now
+        if record['digest'] is None:
+            _remember(key, None, ttl)
+            return None
+        content = _load_blob(record['digest'])
+        if content is not None:
+            try:
+                logo = _decode(content, size, record['digest'])
+                _remember(key, logo, ttl)
+                return logo
+            except Exception as e:
+                logger.warning("Discarding unreadable cached logo for %s: %s", domain, e)
+
+    # Keyed by domain alone: other sizes of the logo use the same bytes
+    content, cacheable = _flights.do(domain, lambda: _fetch(domain, timeout))
+    if content is None:
+        if cacheable:
+            _write_record(domain, None, NEGATIVE_TTL)
+            _remember(key, None, NEGATIVE_TTL)
+        return None
+    try:
+        logo = _decode(content, size, hashlib.sha256(content).hexdigest())
+    except Exception as e:
+        logger.warning("Error decoding logo for %s: %s", domain, e)
+        _write_record(domain, None, NEGATIVE_TTL)
+        _remember(key, None, NEGATIVE_TTL)
+        return None
+    _write_record(domain, _store_blob(content), TTL)
+    _remember(key, logo, TTL)
+    return logo
+
+
+def find_logos(domain_lists, timeout=5, size=LOGO_SIZE, deadline=None):
+    """Return the first available logo of each domain list
+
+    All candidate domains are resolved at once on the shared pool. For each
+    list the earliest domain with a logo wins; lower-priority candidates that
+    have not started yet are cancelled. Lists that cannot be resolved before
+    the deadline (seconds from now, default DEADLINE) yield None.
+    """
+    if deadline is None:
+        deadline = DEADLINE
+    expires_at = time.monotonic() + deadline
+
+    # A first choice held in memory or the atlas settles its list without
+    # touching the pool; one known to be missing is skipped
+    logos = [None] * len(domain_lists)
+    pending = []
+    for position, domains in enumerate(domain_lists):
+        found, logo = _local_logo(domains[0], size) if domains else (False, None)
+        if logo is not None:
+            logos[position] = logo
+        else:
+            pending.append((position, domains[1:] if found else domains))
+
+    futures = {}
+    for _, domains in pending:
+        for domain in domains:
+            if domain not in futures:
+                futures[domain] = _executor.submit(get_logo, domain, timeout, size)
+
+    try:
+        for position, domains in pending:
+            logo = None
+            for domain in domains:
+                try:
+                    logo = futures[domain].result(timeout=max(expires_at - time.monotonic(), 0))
+                except TimeoutError:
+                    break
+                except Exception:
+                    logger.exception("Error resolving logo for %s", domain)
+                    continue
+                if logo is not None:
+                    break
+            logos[position] = logo
+    finally:
+        for future in futures.values():
+            future.cancel()
+    return logos
+
+
+def find_logo(domains, timeout=5, size=LOGO_SIZE, deadline=None):
+    """Return the logo of the first domain in the list that has one"""
+    return find_logos([domains], timeout=timeout, size=size, deadline=deadline)[0]
+
+
+def cache_info():
+    """Return hit/miss/fetch counters, coalesced lookups and the number of logos in memory"""
+    coalesced = _flights.stats()['shared']
+    with _lock:
+        return dict(_stats, coalesced=coalesced, size=len(_memory), max_size=MEMORY_SIZE)
+
+
+def clear_cache():
+    """Forget all logos held in memory; the disk tier is left intact"""
+    global _disk_records
+    with _lock:
+        _memory.clear()
+        _disk_records = None
+
+
+def invalidate(domains):
+    """Forget the cached logos of these domains in memory and on disk
+
+    Returns the number of memory entries dropped.
+    """
+    domains = set(domains)
+    with _lock:
+        keys = [key for key in _memory if key[0] in domains]
+        for key in keys:
+            del _memory[key]
+    if CACHE_DIR:
+        for domain in domains:
+            try:
+                os.remove(_record_path(domain))
+            except OSError:
+                pass
+    return len(keys)
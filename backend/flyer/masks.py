@@ -0,0 +1,29 @@
+"""Precomputed anti-aliased compositing assets
+
+Circle masks and filled circles depend only on their size, so they are built
+once per size by drawing at SUPERSAMPLE times the resolution and downscaling,
+which gives smooth edges instead of the stair-stepped ones ImageDraw.ellipse
+produces at 1x. The returned images are shared and must not be modified.
+"""
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+
+SUPERSAMPLE = 4
+
+
+@lru_cache(maxsize=32)
+def circle_mask(diameter):
+    """Return an anti-aliased 'L' mask of a circle filling a diameter x diameter square"""
+    large = diameter * SUPERSAMPLE
+    mask = Image.new('L', (large, large), 0)
+    ImageDraw.Draw(mask).ellipse([0, 0, large - 1, large - 1], fill=255)
+    return mask.resize((diameter, diameter), Image.Resampling.LANCZOS)
+
+
+@lru_cache(maxsize=32)
+def filled_circle(diameter, color):
+    """Return an RGBA circle of the given color with an anti-aliased edge"""
+    circle = Image.new('RGBA', (diameter, diameter), tuple(color[:3]) + (255,))
+    circle.putalpha(circle_mask(diameter))
+    return circle
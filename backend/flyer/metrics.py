@@ -0,0 +1,168 @@
+"""Process-local metrics in the Prometheus text format
+
+Counters, gauges and histograms are plain in-memory series updated under
+one lock, so recording a value costs a dict lookup and a bisect. Values
+other modules already keep (cache hit counters, job queue depth) are not
+duplicated: they are read by collectors when /metrics is scraped.
+
+Stages timed with stage() while a request is being timed (start_timing())
+are also collected for that request's Server-Timing header.
+
+Each process keeps its own metrics; with several worker processes, every
+scrape sees the worker that answered it.
+"""
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING = os.environ.get('FLYER_SERVER_TIMING', '').lower() in ('1', 'true')
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_lock = threading.Lock()
+_metrics = {}
+_timings = contextvars.ContextVar('flyer_timings', default=None)
+
+
+def _define(name, kind, help, buckets=None):
+    _metrics[name] = {'type': kind, 'help': help, 'buckets': buckets, 'series': {}}
+
+
+_define('flyer_requests_in_flight', 'gauge', 'Requests being handled')
+_define('flyer_requests_total', 'counter', 'Requests handled, by endpoint and status')
+_define('flyer_request_seconds', 'histogram', 'Request latency by endpoint', LATENCY_BUCKETS)
+_define('flyer_stage_seconds', 'histogram', 'Time spent in each flyer pipeline stage', LATENCY_BUCKETS)
+_define('flyer_logo_fetch_seconds', 'histogram', 'Logo API request latency by outcome', LATENCY_BUCKETS)
+_define('flyer_encoded_bytes', 'histogram', 'Size of encoded flyers by encoding', SIZE_BUCKETS)
+_define('flyer_admission_wait_seconds', 'histogram', 'Time renders waited for a render slot', LATENCY_BUCKETS)
+_define('flyer_errors_total', 'counter', 'Errors recovered from, by stage')
+
+
+def _key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def inc(name, labels=None, value=1):
+    """Add value to a counter or gauge"""
+    key = _key(labels)
+    with _lock:
+        series = _metrics[name]['series']
+        series[key] = series.get(key, 0) + value
+
+
+def observe(name, value, labels=None):
+    """Record a value in a histogram"""
+    metric = _metrics[name]
+    key = _key(labels)
+    index = bisect.bisect_left(metric['buckets'], value)
+    with _lock:
+        series = metric['series'].get(key)
+        if series is None:
+            series = metric['series'][key] = [[0] * (len(metric['buckets']) + 1), 0.0, 0]
+        series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+
+def start_timing():
+    """Start collecting stage timings for the current request; returns a token for stop_timing()"""
+    return _timings.set([])
+
+
+def stop_timing(token):
+    """Stop collecting stage timings and return them as (stage, seconds) pairs"""
+    timings = _timings.get()
+    _timings.reset(token)
+    return timings or []
+
+
+def record_stage(name, seconds):
+    """Record the duration of a pipeline stage"""
+    observe('flyer_stage_seconds', seconds, {'stage': name})
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def server_timing(timings):
+    """Format stage timings as a Server-Timing header value, summing repeated stages"""
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(collectors=()):
+    """Return all metrics in the Prometheus text format
+
+    collectors are callables returning (name, type, help, [(labels, value)])
+    tuples, read now for values kept elsewhere.
+    """
+    lines = []
+    with _lock:
+        snapshot = [(name, metric['type'], metric['help'], metric['buckets'],
+                     [(key, value if metric['type'] != 'histogram' else (list(value[0]), value[1], value[2]))
+                      for key, value in metric['series'].items()])
+                    for name, metric in _metrics.items()]
+
+    for name, kind, help, buckets, series in snapshot:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, value in sorted(series):
+            if kind != 'histogram':
+                lines.append(f"{name}{_labels(key)} {_number(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(key)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(key)} {count}")
+
+    for collector in collectors:
+        try:
+            collected = collector()
+        except Exception:
+            logger.exception("Metrics collector failed")
+            continue
+        for name, kind, help, samples in collected:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(_key(labels))} {_number(value)}")
+    return '\n'.join(lines) + '\n'
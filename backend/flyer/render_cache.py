@@ -0,0 +1,258 @@
+"""Content-addressed cache of encoded flyers
+
+Flyers are keyed by a hash of everything that determines their pixels: the
+normalized form fields, the profile image bytes, the template version and the
+digests of the resolved company logos. Encoded images are kept in a memory LRU
+bounded by total bytes and in a disk tier evicted oldest-first once it grows
+past its size limit, down to a low-water mark so the next writes do not
+trigger another scan. Concurrent misses for the same flyer share one render.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from . import singleflight
+from .encoders import DEFAULT_QUALITY, encode, variant
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get('FLYER_RENDER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'flyer-renders'))
+MEMORY_BYTES = int(os.environ.get('FLYER_RENDER_CACHE_MEMORY_BYTES', str(64 * 1024 * 1024)))
+DISK_BYTES = int(os.environ.get('FLYER_RENDER_CACHE_DISK_BYTES', str(512 * 1024 * 1024)))
+# Share of DISK_BYTES the disk tier is trimmed to once it outgrows it
+DISK_LOW_WATER = float(os.environ.get('FLYER_RENDER_CACHE_LOW_WATER', '0.9'))
+
+_memory = OrderedDict()
+_memory_bytes = 0
+_disk_bytes = None
+_lock = threading.Lock()
+_evict_lock = threading.Lock()
+_stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+_flights = singleflight.Group()
+
+
+def _reset_flights():
+    global _flights
+    _flights = singleflight.Group()
+
+
+# A forked process would otherwise wait on renders running in its parent
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_flights)
+
+
+def make_key(fields, image_data, version, logo_digests=()):
+    """Return the cache key for a flyer
+
+    fields maps form field names to values; values are whitespace-stripped so
+    cosmetic differences do not defeat the cache.
+    """
+    normalized = {name: str(value).strip() for name, value in fields.items()}
+    digest = hashlib.sha256()
+    digest.update(json.dumps(normalized, sort_keys=True).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(hashlib.sha256(image_data).digest())
+    digest.update(b'\0')
+    digest.update(str(version).encode('utf-8'))
+    for logo_digest in logo_digests:
+        digest.update(b'\0')
+        digest.update((logo_digest or '-').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def etag(key, name):
+    """Return the strong ETag value for a cached flyer encoding"""
+    return f"{key[:32]}-{name}"
+
+
+def _disk_path(key, fmt):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.{fmt}")
+
+
+def _scan_disk():
+    """Return (mtime, size, path) of every file in the disk tier"""
+    entries = []
+    for root, _, files in os.walk(CACHE_DIR):
+        for filename in files:
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def _evict_disk():
+    """Delete the least recently used files until the disk tier is under its low-water mark
+
+    Scans without holding _lock, so memory hits are not held up; a caller
+    that finds another thread already evicting leaves it to that thread.
+    """
+    global _disk_bytes
+    if not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        entries = sorted(_scan_disk())
+        total = sum(size for _, size, _ in entries)
+        target = DISK_BYTES * DISK_LOW_WATER if total > DISK_BYTES else total
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        # Writes that raced the scan are picked up by the next one
+        with _lock:
+            _disk_bytes = total
+    finally:
+        _evict_lock.release()
+
+
+def _remember(key, fmt, data):
+    global _memory_bytes
+    with _lock:
+        if (key, fmt) in _memory:
+            return
+        _memory[(key, fmt)] = data
+        _memory_bytes += len(data)
+        while _memory_bytes > MEMORY_BYTES and _memory:
+            _, evicted = _memory.popitem(last=False)
+            _memory_bytes -= len(evicted)
+
+
+def _read_disk(key, fmt):
+    if not CACHE_DIR:
+        return None
+    path = _disk_path(key, fmt)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        # Mark as recently used for eviction
+        os.utime(path)
+        return data
+    except OSError:
+        return None
+
+
+def _write_disk(key, fmt, data):
+    global _disk_bytes
+    if not CACHE_DIR:
+        return
+    path = _disk_path(key, fmt)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Failed to cache rendered flyer %s: %s", key, e)
+        return
+    with _lock:
+        if _disk_bytes is not None:
+            _disk_bytes += len(data)
+        over_quota = _disk_bytes is None or _disk_bytes > DISK_BYTES
+    if over_quota:
+        _evict_disk()
+
+
+def get(key, fmt):
+    """Return the cached encoded flyer, or None
+
+    fmt names the encoding, as returned by encoders.variant().
+    """
+    with _lock:
+        data = _memory.get((key, fmt))
+        if data is not None:
+            _memory.move_to_end((key, fmt))
+            _stats['memory_hits'] += 1
+            return data
+
+    data = _read_disk(key, fmt)
+    with _lock:
+        if data is None:
+            _stats['misses'] += 1
+            return None
+        _stats['disk_hits'] += 1
+    _remember(key, fmt, data)
+    return data
+
+
+def disk_path(key, fmt):
+    """Return the disk tier's file of a cached flyer, or None if it has none"""
+    if not CACHE_DIR:
+        return None
+    path = _disk_path(key, fmt)
+    return path if os.path.exists(path) else None
+
+
+def put(key, fmt, data):
+    """Store an encoded flyer in both tiers"""
+    _remember(key, fmt, data)
+    _write_disk(key, fmt, data)
+
+
+def coalesce(key, produce):
+    """Return produce(), sharing one call between concurrent callers with the same key"""
+    return _flights.do(key, produce)
+
+
+def get_or_render(key, fmt, render, quality=DEFAULT_QUALITY, admit=None):
+    """Return (encoded flyer, hit), calling render() for the image on a miss
+
+    admit, when given, returns a context manager held while rendering and
+    encoding (see admission.AdmissionController.admit).
+    """
+    name = variant(fmt, quality)
+    data = get(key, name)
+    if data is not None:
+        return data, True
+
+    def produce():
+        with _lock:
+            # Rendered by a call that finished since the lookup above
+            data = _memory.get((key, name))
+        if data is None:
+            with admit() if admit else nullcontext():
+                data = encode(render(), fmt, quality)
+            put(key, name, data)
+        return data
+
+    return coalesce((key, name), produce), False
+
+
+def artifact_id(key, name):
+    """Return the artifact ID of a flyer encoding (a variant() name)"""
+    return hashlib.sha256(f"{key}:{name}".encode('utf-8')).hexdigest()[:32]
+
+
+def cache_info():
+    """Return hit/miss counters, the hit rate, coalesced renders and tier sizes"""
+    coalesced = _flights.stats()['shared']
+    with _lock:
+        lookups = _stats['memory_hits'] + _stats['disk_hits'] + _stats['misses']
+        hits = _stats['memory_hits'] + _stats['disk_hits']
+        return dict(
+            _stats,
+            hit_rate=round(hits / lookups, 4) if lookups else 0.0,
+            coalesced=coalesced,
+            memory_entries=len(_memory),
+            memory_bytes=_memory_bytes,
+            disk_bytes=_disk_bytes,
+        )
+
+
+def clear_cache():
+    """Forget all flyers held in memory; the disk tier is left intact"""
+    global _memory_bytes
+    with _lock:
+        _memory.clear()
+        _memory_bytes = 0
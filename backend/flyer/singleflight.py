@@ -0,0 +1,58 @@
+"""Single-flight coalescing of duplicate concurrent work
+
+Group.do(key, fn) runs fn() for the first caller of a key; callers that
+arrive with the same key while it is running wait for that call and share
+its result or exception instead of repeating it. Nothing is cached once the
+call returns, so later callers go through the usual caches.
+
+Calls are only shared within one process.
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """A set of in-flight calls keyed by what they compute"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'calls': 0, 'shared': 0}
+
+    def do(self, key, fn):
+        """Return fn(), or the result of the call already running for key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['calls'] += 1
+            else:
+                self._stats['shared'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """Return the calls made and the callers that shared one"""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
@@ -0,0 +1,153 @@
+"""Text layout memoized per (text, face, size)
+
+measure() asks FreeType for a string's bounding box once and keeps it in a
+bounded LRU. fit() lays a string out in a box: it binary-searches the
+largest font size at which the string, wrapped at word boundaries, fits in
+max_width and max_lines, and shortens the last line with an ellipsis when
+even the smallest size does not fit. Finished layouts are cached too, so a
+flyer that repeats a name or company costs a dict lookup per string.
+
+Widths are measured like draw.textbbox() measures them, so text that fits
+at its design size is placed exactly as before.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from .fonts import get_font
+
+CACHE_SIZE = int(os.environ.get('FLYER_TEXT_CACHE_SIZE', '4096'))
+# Plain dots: the fallback bitmap font has no glyph outside latin-1
+ELLIPSIS = '...'
+
+_measurements = OrderedDict()
+_layouts = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'layout_hits': 0, 'layout_misses': 0}
+
+
+def _cached(cache, key, compute, hit, miss):
+    with _lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+            _stats[hit] += 1
+            return value
+        _stats[miss] += 1
+    # Computed outside the lock; two threads racing on a key compute the same value
+    value = compute()
+    with _lock:
+        cache[key] = value
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+    return value
+
+
+def measure(text, face, size):
+    """Return the bounding box of text drawn at (0, 0) in a face and size"""
+    return _cached(_measurements, (text, face, size), lambda: tuple(get_font(face, size).getbbox(text)),
+                   'hits', 'misses')
+
+
+def text_width(text, face, size):
+    """Return the width of text in a face and size"""
+    left, _, right, _ = measure(text, face, size)
+    return right - left
+
+
+def wrap(text, face, size, max_width):
+    """Break text into lines no wider than max_width at word boundaries
+
+    A word wider than max_width gets a line of its own.
+    """
+    lines = []
+    line = ''
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if not line or text_width(candidate, face, size) <= max_width:
+            line = candidate
+        else:
+            lines.append(line)
+            line = word
+    if line:
+        lines.append(line)
+    return lines or ['']
+
+
+def ellipsize(text, face, size, max_width):
+    """Return text, or its longest prefix plus an ellipsis, that fits max_width"""
+    if text_width(text, face, size) <= max_width:
+        return text
+    low, high = 0, len(text) - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if text_width(text[:middle].rstrip() + ELLIPSIS, face, size) <= max_width:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + ELLIPSIS
+
+
+def _fits(text, face, size, max_width, max_lines):
+    lines = [text] if max_lines == 1 else wrap(text, face, size, max_width)
+    return len(lines) <= max_lines and all(text_width(line, face, size) <= max_width for line in lines)
+
+
+def _layout(text, face, max_size, max_width, min_size, max_lines):
+    size = max_size
+    if not _fits(text, face, size, max_width, max_lines):
+        # Largest size that fits, or min_size with the overflow elided
+        low, high = min_size, max_size - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if _fits(text, face, middle, max_width, max_lines):
+                low = middle
+            else:
+                high = middle - 1
+        size = low
+    lines = [text] if max_lines == 1 else wrap(text, face, size, max_width)
+    if len(lines) > max_lines or text_width(lines[-1], face, size) > max_width:
+        # The last line takes every remaining word and is cut short
+        kept = lines[:max_lines - 1]
+        rest = ' '.join(text.split()[len(' '.join(kept).split()):])
+        lines = kept + [ellipsize(rest, face, size, max_width)]
+    font = get_font(face, size)
+    if hasattr(font, 'getmetrics'):
+        ascent, descent = font.getmetrics()
+        line_height = ascent + descent
+    else:
+        # The fallback bitmap font has no metrics
+        line_height = measure('Ay', face, size)[3]
+    return {
+        'face': face,
+        'size': size,
+        'max_size': max_size,
+        'lines': tuple((line, text_width(line, face, size)) for line in lines),
+        'line_height': line_height,
+    }
+
+
+def fit(text, face, max_size, max_width, min_size=None, max_lines=1):
+    """Lay out text in the largest size from min_size to max_size that fits
+
+    Returns a dict with the face, chosen size, max_size, lines as
+    (text, width) pairs and line_height. The dict is shared between callers
+    and must not be modified.
+    """
+    min_size = min(min_size or max_size, max_size)
+    key = (text, face, max_size, max_width, min_size, max_lines)
+    return _cached(_layouts, key, lambda: _layout(text, face, max_size, max_width, min_size, max_lines),
+                   'layout_hits', 'layout_misses')
+
+
+def cache_info():
+    """Return hit/miss counters and the number of cached measurements and layouts"""
+    with _lock:
+        return dict(_stats, size=len(_measurements), layouts=len(_layouts), max_size=CACHE_SIZE)
+
+
+def clear_cache():
+    """Forget all measurements and layouts"""
+    with _lock:
+        _measurements.clear()
+        _layouts.clear()
@@ -0,0 +1,133 @@
+"""Streaming parser for flyer form uploads
+
+read_flyer_upload() parses a multipart/form-data body chunk by chunk instead
+of letting Werkzeug buffer the whole request first, so a bad request is
+turned away before the rest of it is read:
+
+- the declared Content-Length is checked before reading anything
+- text fields are length-limited as they arrive, and must all be present
+  by the time the profile image part starts (browsers send parts in the
+  order they were appended, and the form appends the picture last)
+- the image's magic bytes and dimensions are checked from its first chunks
+  (ingest.HeaderReader), and the byte limit as it streams in
+- the image is spooled to a temporary file once it outgrows SPOOL_BYTES
+"""
+import os
+import tempfile
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import NEED_DATA, Data, Epilogue, Field, File, MultipartDecoder
+
+from .ingest import MAX_BYTES, HeaderReader, ProfileImageError, ProfileImageTooLarge
+
+MAX_FIELD_BYTES = int(os.environ.get('FLYER_MAX_FIELD_BYTES', '1024'))
+SPOOL_BYTES = int(os.environ.get('FLYER_UPLOAD_SPOOL_BYTES', str(1024 * 1024)))
+# Room for the text fields and multipart framing around the image
+MAX_REQUEST_BYTES = MAX_BYTES + 64 * 1024
+CHUNK_SIZE = 64 * 1024
+MAX_PARTS = 32
+
+
+class UploadError(ProfileImageError):
+    """The request body is not an acceptable flyer form"""
+
+
+class UploadTooLarge(ProfileImageTooLarge, UploadError):
+    """The request body exceeds a size limit"""
+
+
+def read_flyer_upload(stream, content_type, content_length, required, optional=(), file_field='profile_image',
+                      max_request_bytes=MAX_REQUEST_BYTES):
+    """Parse a flyer form from a request body stream
+
+    Returns (fields, image bytes); fields holds the required and optional
+    text fields that were sent, other parts are skipped. Raises UploadError
+    (or a ProfileImageError for the picture) with the HTTP status to answer.
+    """
+    mimetype, options = parse_options_header(content_type or '')
+    boundary = options.get('boundary')
+    if mimetype != 'multipart/form-data' or not boundary:
+        raise UploadError('Expected a multipart/form-data request')
+    if content_length is not None and content_length > max_request_bytes:
+        raise UploadTooLarge(f"Request must be at most {max_request_bytes // (1024 * 1024)} MB")
+
+    wanted = set(required) | set(optional)
+    decoder = MultipartDecoder(boundary.encode('latin-1'), max_parts=MAX_PARTS)
+    fields = {}
+    part = None        # (kind, name) of the part being read
+    value = None       # bytearray of the current text field
+    header = None
+    image = None
+    image_bytes = 0
+    received = 0
+
+    try:
+        while True:
+            event = decoder.next_event()
+            if event is NEED_DATA:
+                try:
+                    chunk = stream.read(CHUNK_SIZE)
+                except RequestEntityTooLarge:
+                    # The server's own body limit, hit by a body sent without a Content-Length
+                    raise UploadTooLarge(f"Request must be at most {max_request_bytes // (1024 * 1024)} MB")
+                received += len(chunk)
+                if received > max_request_bytes:
+                    raise UploadTooLarge(f"Request must be at most {max_request_bytes // (1024 * 1024)} MB")
+                decoder.receive_data(chunk or None)
+                continue
+
+            if isinstance(event, Field):
+                part = ('field', event.name)
+                value = bytearray()
+            elif isinstance(event, File):
+                # Browsers send an empty, unnamed file part when no file was chosen
+                if event.name == file_field and event.filename and image is None:
+                    missing = [name for name in required if not fields.get(name)]
+                    if missing:
+                        raise UploadError(f"All fields are required and must precede {file_field} "
+                                          f"(missing: {', '.join(missing)})")
+                    part = ('image', event.name)
+                    header = HeaderReader()
+                    image = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+                else:
+                    part = ('skip', event.name)
+            elif isinstance(event, Data):
+                kind, name = part
+                if kind == 'field' and name in wanted:
+                    value += event.data
+                    if len(value) > MAX_FIELD_BYTES:
+                        raise UploadTooLarge(f"{name} must be at most {MAX_FIELD_BYTES} bytes")
+                    if not event.more_data:
+                        fields[name] = value.decode('utf-8', 'replace')
+                elif kind == 'image':
+                    image_bytes += len(event.data)
+                    if image_bytes > MAX_BYTES:
+                        raise ProfileImageTooLarge(f"Profile image must be at most {MAX_BYTES // (1024 * 1024)} MB")
+                    header.feed(event.data)
+                    image.write(event.data)
+                    if not event.more_data:
+                        part = ('done', name)
+            elif isinstance(event, Epilogue):
+                break
+    except (ValueError, RequestEntityTooLarge) as e:
+        if image is not None:
+            image.close()
+        if isinstance(e, ProfileImageError):
+            raise
+        if isinstance(e, RequestEntityTooLarge):
+            # Raised by the decoder only for too many parts
+            raise UploadTooLarge(f"At most {MAX_PARTS} form parts are allowed")
+        # Truncated body or broken multipart framing
+        raise UploadError(f"Malformed form data: {e}")
+
+    if image is None:
+        missing = [name for name in required if not fields.get(name)]
+        raise UploadError(f"All fields are required (missing: {', '.join(missing + [file_field])})")
+    try:
+        if header.size is None:
+            raise ProfileImageError("Profile image must be a valid image file")
+        image.seek(0)
+        return fields, image.read()
+    finally:
+        image.close()
@@ -0,0 +1,103 @@
+"""Warm-up of everything a layout's first flyer would otherwise load
+
+warm(layout) runs these steps, timing each:
+
+- fonts: the layout's font at its design sizes; a face that falls back to
+  the default font fails the warm-up
+- layers: its static background layer at 1x
+- atlas: the logo atlas index and tile mapping
+- sample: one throwaway flyer (see engine.draw_sample), which fills the
+  circle masks, text layouts and image decoders
+
+The company index is loaded when the app is built. A server that imports
+the app in a master process before forking its workers (see wsgi.py) warms
+up once there, and every worker starts with the caches filled and shares
+their memory pages with the others copy-on-write.
+
+status() reports the progress for the readiness endpoint.
+"""
+import logging
+import os
+import threading
+import time
+
+from . import atlas, engine
+from .background import get_layer
+from .fonts import available as font_available, prewarm as prewarm_font
+from .layouts import FONT, LAYOUTS
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_status = {}
+
+
+def _warm_fonts(layout):
+    prewarm_font(FONT, LAYOUTS[layout]['font_sizes'])
+    if not font_available(FONT):
+        # Flyers would still render, but not in the brand font
+        raise RuntimeError(f"{FONT} font is unavailable, flyers use the fallback font "
+                           f"(run `python -m flyer.fonts vendor`)")
+
+
+def _steps(layout):
+    return [
+        ('fonts', lambda: _warm_fonts(layout)),
+        ('layers', lambda: get_layer(layout, LAYOUTS[layout]['size'])),
+        ('atlas', atlas.cache_info),
+        ('sample', lambda: engine.draw_sample(layout)),
+    ]
+
+
+def warm(layout=engine.DEFAULT_LAYOUT):
+    """Warm a layout's caches up, unless that is done or underway; returns its status"""
+    with _lock:
+        status = _status.get(layout)
+        if status is not None and status['state'] in ('warming', 'ready'):
+            return dict(status, steps=dict(status['steps']))
+        status = _status[layout] = {'state': 'warming', 'steps': {}, 'seconds': None, 'error': None}
+
+    started = time.perf_counter()
+    for name, step in _steps(layout):
+        step_start = time.perf_counter()
+        try:
+            step()
+            error = None
+        except Exception as e:
+            # Whatever did not load is loaded by the first request instead
+            logger.exception("Warm-up step %s failed", name)
+            error = f"{name}: {e}"
+        with _lock:
+            status['steps'][name] = round((time.perf_counter() - step_start) * 1000, 1)
+            status['error'] = status['error'] or error
+    with _lock:
+        status['seconds'] = round(time.perf_counter() - started, 3)
+        status['state'] = 'failed' if status['error'] else 'ready'
+        return dict(status, steps=dict(status['steps']))
+
+
+def start(layout=engine.DEFAULT_LAYOUT):
+    """Warm a layout's caches up on a background thread"""
+    threading.Thread(target=warm, args=(layout,), name='flyer-warmup', daemon=True).start()
+
+
+def status(layout=engine.DEFAULT_LAYOUT):
+    """Return a layout's warm-up state ('cold', 'warming', 'ready' or 'failed'), step timings in ms and error"""
+    with _lock:
+        status = _status.get(layout)
+        if status is None:
+            return {'state': 'cold', 'steps': {}, 'seconds': None, 'error': None}
+        return dict(status, steps=dict(status['steps']))
+
+
+def _restart_in_child():
+    """Start over warm-ups a fork interrupted; their threads stayed in the parent"""
+    global _lock
+    _lock = threading.Lock()
+    for layout in [layout for layout, status in _status.items() if status['state'] == 'warming']:
+        del _status[layout]
+        start(layout)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_in_child)
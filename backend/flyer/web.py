@@ -0,0 +1,587 @@
+"""Flask adapter for the flyer engine
+
+create_app() builds the HTTP API around flyer.engine; backend/app.py and the
+serverless api/index.py are thin wrappers choosing a layout and options.
+Building the app only wires routes and loads the companies index; fonts,
+template layers and logos are loaded on first use unless prewarmed.
+"""
+import base64
+import io
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import as_completed
+from contextlib import ExitStack, nullcontext
+from datetime import datetime
+
+from flask import Flask, request, jsonify, send_file, Response, g, stream_with_context
+from flask_cors import CORS
+
+from . import admission, artifacts, atlas, batch, engine, jobs, metrics, render_cache, uploads, warmup
+from .companies import CompanyDirectory, changed_domains
+from .encoders import FORMAT_ALIASES, MIMETYPES, encode, encoder_stats, negotiate_format, negotiate_quality, variant
+from .fonts import cache_info as font_cache_info
+from .ingest import MAX_BYTES as MAX_PROFILE_BYTES, ProfileImageError, open_image
+from .logos import cache_info as logo_cache_info, invalidate as invalidate_logos
+from .text import cache_info as text_cache_info
+
+COMPANIES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'companies.json')
+# Ceiling for any request body (default: a full batch, or one flyer without batches)
+MAX_CONTENT_LENGTH = int(os.environ.get('FLYER_MAX_CONTENT_LENGTH', '0')) or None
+
+
+def _save_artifact(cache_key, name, fmt, data):
+    """Keep a cached flyer encoding retrievable from /api/flyers/<id> and return its ID
+
+    The artifact shares the render cache's file when there is one, so the
+    flyer is stored on disk once.
+    """
+    return artifacts.save(data, fmt, artifact_id=render_cache.artifact_id(cache_key, name),
+                          source=render_cache.disk_path(cache_key, name))
+
+
+def _collectors(companies, job_queue, admission_control):
+    """Return the /metrics collectors for values kept by the caches and queues"""
+    def caches():
+        logos = logo_cache_info()
+        fonts = font_cache_info()
+        texts = text_cache_info()
+        renders = render_cache.cache_info()
+        return [
+            ('flyer_logo_cache_lookups_total', 'counter', 'Logo cache lookups by result',
+             [({'result': 'hit'}, logos['hits']), ({'result': 'negative_hit'}, logos['negative_hits']),
+              ({'result': 'atlas_hit'}, logos['atlas_hits']), ({'result': 'miss'}, logos['misses'])]),
+            ('flyer_logo_fetches_total', 'counter', 'Requests made to the logo API', [({}, logos['fetches'])]),
+            ('flyer_coalesced_total', 'counter', 'Lookups and renders that shared a concurrent identical one',
+             [({'work': 'logo'}, logos['coalesced']), ({'work': 'render'}, renders['coalesced'])]),
+            ('flyer_logo_cache_entries', 'gauge', 'Logos held in memory', [({}, logos['size'])]),
+            ('flyer_font_cache_lookups_total', 'counter', 'Font cache lookups by result',
+             [({'result': 'hit'}, fonts['hits']), ({'result': 'miss'}, fonts['misses'])]),
+            ('flyer_font_cache_entries', 'gauge', 'Fonts held in memory', [({}, fonts['size'])]),
+            ('flyer_text_cache_lookups_total', 'counter', 'Text measurement and layout cache lookups by result',
+             [({'cache': 'measure', 'result': 'hit'}, texts['hits']),
+              ({'cache': 'measure', 'result': 'miss'}, texts['misses']),
+              ({'cache': 'layout', 'result': 'hit'}, texts['layout_hits']),
+              ({'cache': 'layout', 'result': 'miss'}, texts['layout_misses'])]),
+            ('flyer_render_cache_lookups_total', 'counter', 'Render cache lookups by result',
+             [({'result': 'memory_hit'}, renders['memory_hits']), ({'result': 'disk_hit'}, renders['disk_hits']),
+              ({'result': 'miss'}, renders['misses'])]),
+            ('flyer_render_cache_bytes', 'gauge', 'Size of the render cache by tier',
+             [({'tier': 'memory'}, renders['memory_bytes']), ({'tier': 'disk'}, renders['disk_bytes'] or 0)]),
+            ('flyer_companies', 'gauge', 'Companies in the directory', [({}, len(companies.index))]),
+            ('flyer_companies_version', 'gauge', 'Reloads of the company directory', [({}, companies.version)]),
+        ]
+
+    def queue():
+        stats = job_queue.stats()
+        return [
+            ('flyer_job_queue_depth', 'gauge', 'Jobs waiting for a worker', [({}, stats['queue_depth'])]),
+            ('flyer_jobs_running', 'gauge', 'Jobs being rendered', [({}, stats['running'])]),
+            ('flyer_jobs_total', 'counter', 'Jobs by outcome',
+             [({'outcome': outcome}, stats[outcome]) for outcome in ('succeeded', 'failed', 'rejected')]),
+        ]
+
+    def renders():
+        stats = admission_control.stats()
+        return [
+            ('flyer_renders_running', 'gauge', 'Renders holding a render slot', [({}, stats['running'])]),
+            ('flyer_renders_waiting', 'gauge', 'Renders queued for a render slot', [({}, stats['waiting'])]),
+            ('flyer_admissions_total', 'counter', 'Render admission decisions by outcome',
+             [({'outcome': outcome}, stats[outcome]) for outcome in ('admitted', 'rejected', 'timed_out')]),
+        ]
+
+    return [caches, renders, queue] if job_queue else [caches, renders]
+
+
+def create_app(layout=engine.DEFAULT_LAYOUT, companies_path=COMPANIES_PATH, health_path='/health',
+               metrics_path='/metrics', ready_path='/ready', enable_batch=True, enable_jobs=True, prewarm=False,
+               install_sighup=False):
+    """Create the flyer API for a layout
+
+    With prewarm, the layout's caches are warmed up now (see warmup) rather
+    than by the first request; prewarm='background' warms them up on a
+    thread, and ready_path answers 503 until that is done. install_sighup
+    reloads companies.json on SIGHUP and only works when called from the
+    main thread.
+    """
+    if layout not in engine.LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}")
+
+    app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH or (
+        max(batch.MAX_REQUEST_BYTES, uploads.MAX_REQUEST_BYTES) if enable_batch else uploads.MAX_REQUEST_BYTES)
+    CORS(app, expose_headers=['Content-Disposition', 'X-Flyer-Id', 'X-Directory-Version', 'Location', 'Retry-After'])
+
+    # Tech companies directory, reloaded when companies.json changes
+    companies = CompanyDirectory(companies_path)
+    companies.add_listener(lambda old, new: invalidate_logos(changed_domains(old, new)))
+    if install_sighup:
+        companies.install_sighup_handler()
+    app.extensions['flyer_companies'] = companies
+
+    # Background renders for ?async=1; workers start with the first job
+    job_queue = jobs.JobQueue() if enable_jobs else None
+    app.extensions['flyer_jobs'] = job_queue
+    # Bounds the flyers rendered at once for requests waiting on them
+    admission_control = admission.AdmissionController()
+
+    if prewarm == 'background':
+        warmup.start(layout)
+    elif prewarm:
+        warmup.warm(layout)
+
+    @app.before_request
+    def start_request():
+        metrics.inc('flyer_requests_in_flight')
+        g.flyer_started = time.perf_counter()
+        g.flyer_timing = metrics.start_timing()
+
+    @app.after_request
+    def finish_request(response):
+        timings = metrics.stop_timing(g.pop('flyer_timing'))
+        elapsed = time.perf_counter() - g.flyer_started
+        endpoint = request.endpoint or 'unmatched'
+        metrics.inc('flyer_requests_total', {'endpoint': endpoint, 'status': response.status_code})
+        metrics.observe('flyer_request_seconds', elapsed, {'endpoint': endpoint})
+        if metrics.SERVER_TIMING and timings:
+            response.headers['Server-Timing'] = f"{metrics.server_timing(timings)}, total;dur={elapsed * 1000:.1f}"
+            response.headers['Timing-Allow-Origin'] = '*'
+        return response
+
+    @app.teardown_request
+    def end_request(error=None):
+        if 'flyer_timing' in g:
+            metrics.stop_timing(g.pop('flyer_timing'))
+        metrics.inc('flyer_requests_in_flight', value=-1)
+
+    @app.errorhandler(413)
+    def request_too_large(error):
+        return jsonify({'error': 'Request body is too large'}), 413
+
+    @app.route('/api/companies', methods=['GET'])
+    def get_companies():
+        """Get list of tech companies for dropdowns with logos
+
+        With a `q` parameter, returns a page (`offset`, `limit`) of typeahead
+        matches instead of the whole directory.
+        """
+        query = request.args.get('q')
+        # Read the directory once so the whole response comes from one version
+        index = companies.index
+        version = str(companies.version)
+        if query is not None:
+            try:
+                offset = max(int(request.args.get('offset', 0)), 0)
+                limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+            except ValueError:
+                return jsonify({'error': 'offset and limit must be integers'}), 400
+            total, results = index.search(query, offset, limit)
+            response = jsonify({'companies': results, 'total': total, 'offset': offset, 'limit': limit})
+            response.headers['X-Directory-Version'] = version
+            return response
+
+        # The full directory is served pre-serialized, gzipped when accepted
+        use_gzip = request.accept_encodings['gzip'] > 0
+        etag = f"{index.etag}-gz" if use_gzip else index.etag
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(index.gzip_body if use_gzip else index.body,
+                                          mimetype='application/json')
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        response.headers['X-Directory-Version'] = version
+        return response
+
+    @app.route(atlas.SPRITE_URL, methods=['GET'])
+    def get_logo_sprite():
+        """Logos of the directory's companies as one sprite sheet
+
+        Companies in /api/companies carry their position in it; the URL
+        they give is versioned, so it may be cached for good.
+        """
+        sheet = atlas.sprite()
+        if sheet is None:
+            return jsonify({'error': 'No logo atlas has been built'}), 404
+        data, digest = sheet
+        etag = digest[:32]
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(data, mimetype='image/png')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        if request.args.get('v') == digest[:16]:
+            response.cache_control.max_age = 365 * 24 * 3600
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.max_age = 3600
+        return response
+
+    @app.route('/api/generate-flyer', methods=['POST'])
+    def generate_flyer():
+        """Generate a tech transfer announcement flyer
+
+        Responds with the raw image when the client asks for image/png,
+        image/webp or image/jpeg (Accept header or `format` query parameter),
+        otherwise with the base64 encoded PNG in JSON. The `quality` query
+        parameter picks the encoder tier (lossless, high or low) and `scale`
+        the resolution (2 for a 1600x1800 flyer, in steps of 0.25).
+
+        With `presets` (a comma-separated list of engine.PRESETS names, or
+        `all`), the flyer is rendered once and every preset size is returned
+        in one JSON response.
+
+        With `async=1`, responds 202 with a job ID right away and renders in
+        the background; poll /api/jobs/<id>, or pass a `callback_url` form
+        field to be sent the finished job.
+
+        Responds 412 when If-None-Match holds the ETag of the flyer the
+        request would return, and 429 or 503 with Retry-After when too many
+        flyers are being rendered.
+        """
+        try:
+            image_format = negotiate_format(request.accept_mimetypes, request.args.get('format'))
+            quality = negotiate_quality(request.args.get('quality'))
+            scale = engine.parse_scale(request.args.get('scale'))
+            presets = request.args.get('presets')
+            if presets:
+                presets = list(engine.PRESETS) if presets == 'all' else list(dict.fromkeys(
+                    preset.strip() for preset in presets.split(',') if preset.strip()))
+                for preset in presets:
+                    engine.preset_size(layout, preset)
+            run_async = request.args.get('async', '').lower() in ('1', 'true')
+            if run_async and not job_queue:
+                raise ValueError('Async mode is not available')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        encoding = variant(image_format or 'png', quality)
+
+        # The body is streamed, so a bad form is rejected before the
+        # picture is read in full
+        try:
+            with metrics.stage('upload'):
+                spec, profile_image = uploads.read_flyer_upload(
+                    request.stream, request.content_type, request.content_length, engine.FIELDS,
+                    optional=('callback_url',),
+                    max_request_bytes=min(uploads.MAX_REQUEST_BYTES, app.config['MAX_CONTENT_LENGTH']))
+        except ProfileImageError as e:
+            return jsonify({'error': str(e)}), e.status_code
+
+        callback_url = spec.pop('callback_url', None)
+        if callback_url:
+            try:
+                if not job_queue:
+                    raise ValueError('Async mode is not available')
+                jobs.validate_callback_url(callback_url)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            run_async = True
+
+        try:
+            filename = f"{spec['name'].replace(' ', '_')}_tech_transfer"
+            spec['profile_image'] = profile_image
+            spec['layout'] = layout
+            spec['scale'] = engine.presets_scale(spec, presets) if presets else scale
+            if run_async:
+                return submit_job(spec, presets, image_format or 'png', quality, filename, callback_url)
+            logos = engine.resolve_logos(spec, companies.index)
+            if presets:
+                return presets_response(spec, logos, presets, image_format or 'png', quality, filename)
+
+            # Identical inputs map to the same cached flyer
+            cache_key = engine.cache_key(spec, logos)
+            etag = render_cache.etag(cache_key, encoding if image_format else variant('json', quality))
+            if request.if_none_match.contains(etag):
+                response = unchanged(etag)
+                response.vary.add('Accept')
+                return response
+
+            data, _ = render_cache.get_or_render(cache_key, image_format or 'png',
+                                                 lambda: engine.render(spec, logos), quality,
+                                                 admit=admission_control.admit)
+
+            # Keep the flyer retrievable from /api/flyers/<id>; identical
+            # flyers share one artifact
+            with metrics.stage('store'):
+                flyer_id = _save_artifact(cache_key, encoding, image_format or 'png', data)
+
+            # Stream the encoded image straight back when asked to
+            if image_format:
+                response = send_file(io.BytesIO(data), mimetype=MIMETYPES[image_format],
+                                     download_name=f"{filename}.{image_format}")
+            else:
+                with metrics.stage('respond'):
+                    response = jsonify({
+                        'success': True,
+                        'id': flyer_id,
+                        'url': f"/api/flyers/{flyer_id}",
+                        'image_data': base64.b64encode(data).decode('utf-8'),
+                        'filename': f"{filename}.png"
+                    })
+            response.headers['X-Flyer-Id'] = flyer_id
+            response.set_etag(etag)
+            response.vary.add('Accept')
+            return response
+
+        except admission.Overloaded as e:
+            return retry_later(e, e.status_code)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    def unchanged(etag):
+        """Respond to a POST whose If-None-Match matches the flyer it would return
+
+        The client already holds that flyer. RFC 9110 has a matching
+        If-None-Match answered with 412 rather than 304 on methods other than
+        GET and HEAD; either way nothing is rendered or sent again.
+        """
+        response = jsonify({'error': 'The flyer matches If-None-Match'})
+        response.status_code = 412
+        response.set_etag(etag)
+        return response
+
+    def retry_later(error, status_code):
+        """Respond that the server is saturated and when to retry"""
+        response = jsonify({'error': str(error)})
+        response.status_code = status_code
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+
+    def preset_outputs(cache_key, spec, logos, presets, fmt, quality, filename, admit=None):
+        """Return (output, encoded flyer) for every preset, rendering at most once
+
+        admit is held while rendering, as for render_cache.get_or_render().
+        """
+        encoding = variant(fmt, quality)
+        names = {preset: f"{preset}.{encoding}" for preset in presets}
+        encoded = {preset: render_cache.get(cache_key, name) for preset, name in names.items()}
+        missing = [preset for preset, data in encoded.items() if data is None]
+        if missing:
+            def render_missing():
+                with admit() if admit else nullcontext():
+                    rendered = {preset: encode(image, fmt, quality)
+                                for preset, image in engine.render_presets(spec, logos, missing).items()}
+                for preset, data in rendered.items():
+                    render_cache.put(cache_key, names[preset], data)
+                return rendered
+
+            encoded.update(render_cache.coalesce((cache_key, tuple(names[preset] for preset in missing)),
+                                                 render_missing))
+
+        outputs = []
+        for preset in presets:
+            data = encoded[preset]
+            flyer_id = _save_artifact(cache_key, names[preset], fmt, data)
+            width, height = engine.preset_size(layout, preset)
+            outputs.append(({
+                'preset': preset,
+                'width': width,
+                'height': height,
+                'id': flyer_id,
+                'url': f"/api/flyers/{flyer_id}",
+                'filename': f"{filename}_{preset}.{fmt}"
+            }, data))
+        return outputs
+
+    def presets_response(spec, logos, presets, fmt, quality, filename):
+        """Respond with every preset size of a flyer"""
+        cache_key = engine.cache_key(spec, logos)
+        etag = render_cache.etag(cache_key, f"{'+'.join(presets)}.{variant(fmt, quality)}.json")
+        if request.if_none_match.contains(etag):
+            return unchanged(etag)
+
+        outputs = [dict(output, image_data=base64.b64encode(data).decode('utf-8'))
+                   for output, data in preset_outputs(cache_key, spec, logos, presets, fmt, quality, filename,
+                                                      admit=admission_control.admit)]
+        response = jsonify({'success': True, 'outputs': outputs})
+        response.set_etag(etag)
+        return response
+
+    def submit_job(spec, presets, fmt, quality, filename, callback_url=None):
+        """Queue a flyer for background rendering and respond 202 with its job"""
+        def run():
+            logos = engine.resolve_logos(spec, companies.index)
+            cache_key = engine.cache_key(spec, logos)
+            if presets:
+                return {'outputs': [output for output, _ in
+                                    preset_outputs(cache_key, spec, logos, presets, fmt, quality, filename)]}
+            data, _ = render_cache.get_or_render(cache_key, fmt, lambda: engine.render(spec, logos), quality)
+            flyer_id = _save_artifact(cache_key, variant(fmt, quality), fmt, data)
+            return {'id': flyer_id, 'url': f"/api/flyers/{flyer_id}", 'filename': f"{filename}.{fmt}"}
+
+        try:
+            job = job_queue.submit(run, callback_url)
+        except jobs.QueueFull as e:
+            return retry_later(e, 503)
+        response = jsonify({'success': True, 'job_id': job['id'], 'status': job['status'],
+                            'url': f"/api/jobs/{job['id']}"})
+        response.status_code = 202
+        response.headers['Location'] = f"/api/jobs/{job['id']}"
+        return response
+
+    if enable_jobs:
+        @app.route('/api/jobs/<job_id>', methods=['GET'])
+        def get_job(job_id):
+            """Get the status of a background flyer job, and its flyer once done"""
+            job = job_queue.get(job_id)
+            if not job:
+                return jsonify({'error': 'Job not found'}), 404
+            response = jsonify(job)
+            if job['status'] in ('queued', 'running'):
+                response.headers['Retry-After'] = '1'
+            return response
+
+    @app.route('/api/flyers/<flyer_id>', methods=['GET'])
+    def get_flyer(flyer_id):
+        """Get a previously generated flyer by ID"""
+        ext = request.args.get('format')
+        found = artifacts.find(flyer_id, FORMAT_ALIASES.get(ext, ext))
+        if not found:
+            return jsonify({'error': 'Flyer not found'}), 404
+        path, ext = found
+        return send_file(path, mimetype=MIMETYPES.get(ext), download_name=f"{flyer_id}_tech_transfer.{ext}")
+
+    if enable_batch:
+        @app.route('/api/generate-flyers/batch', methods=['POST'])
+        def generate_flyers_batch():
+            """Generate several flyers in parallel, streamed back as a ZIP or NDJSON
+
+            Expects a `specs` form field holding a JSON list of flyer specs with
+            the same fields as /api/generate-flyer. Each spec's `profile_image`
+            names the file part holding its picture (default
+            `profile_image_<index>`). The whole request may be at most
+            batch.MAX_REQUEST_BYTES. The batch goes through admission control
+            like single renders, taking a slot per flyer rendered at once.
+            """
+            if request.content_length is not None and request.content_length > batch.MAX_REQUEST_BYTES:
+                return jsonify({'error': f'Batch requests must be at most '
+                                         f'{batch.MAX_REQUEST_BYTES // (1024 * 1024)} MB'}), 413
+            try:
+                specs = json.loads(request.form.get('specs', ''))
+            except json.JSONDecodeError:
+                return jsonify({'error': 'specs must be a JSON list of flyer specs'}), 400
+            if not isinstance(specs, list) or not specs:
+                return jsonify({'error': 'specs must be a JSON list of flyer specs'}), 400
+            if len(specs) > batch.MAX_SIZE:
+                return jsonify({'error': f'At most {batch.MAX_SIZE} flyers per batch'}), 400
+
+            output_format = request.args.get('format', 'zip')
+            if output_format not in ('zip', 'ndjson'):
+                return jsonify({'error': 'format must be zip or ndjson'}), 400
+            try:
+                quality = negotiate_quality(request.args.get('quality'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            # Validate every spec, then every picture, before rendering anything
+            items = []
+            pictures = []
+            for index, item in enumerate(specs):
+                if not isinstance(item, dict):
+                    return jsonify({'error': f'Flyer {index}: spec must be an object'}), 400
+                profile_image = request.files.get(item.get('profile_image') or f'profile_image_{index}')
+                if not all(item.get(field) for field in engine.FIELDS) or not profile_image:
+                    return jsonify({'error': f'Flyer {index}: all fields are required'}), 400
+                spec = {field: str(item[field]) for field in engine.FIELDS}
+                spec['layout'] = layout
+                items.append(spec)
+                pictures.append(profile_image)
+            for index, (spec, profile_image) in enumerate(zip(items, pictures)):
+                # One byte past the limit is enough to refuse the picture
+                spec['profile_image'] = profile_image.read(MAX_PROFILE_BYTES + 1)
+                try:
+                    open_image(spec['profile_image'])
+                except ProfileImageError as e:
+                    return jsonify({'error': f'Flyer {index}: {e}'}), e.status_code
+
+            all_logos = batch.resolve_logos(items, companies.index)
+
+            # The batch holds a render slot for each flyer the pool renders at
+            # once, until its last flyer is done
+            slots = ExitStack()
+            try:
+                slots.enter_context(admission_control.admit(min(len(items), batch.WORKERS)))
+            except admission.Overloaded as e:
+                return retry_later(e, e.status_code)
+            try:
+                futures = {batch.submit(layout, batch.render_item, index, spec, logos, quality): index
+                           for index, (spec, logos) in enumerate(zip(items, all_logos))}
+            except BaseException:
+                slots.close()
+                raise
+            batch.when_done(futures, slots.close)
+
+            def generate_ndjson():
+                for future in as_completed(futures):
+                    try:
+                        index, filename, data = future.result()
+                        line = {'index': index, 'success': True, 'filename': filename,
+                                'image_data': base64.b64encode(data).decode('utf-8')}
+                    except Exception as e:
+                        line = {'index': futures[future], 'success': False, 'error': str(e)}
+                    yield json.dumps(line) + '\n'
+
+            def generate_zip():
+                stream = batch.ZipStream()
+                errors = []
+                with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as archive:
+                    for future in as_completed(futures):
+                        try:
+                            index, filename, data = future.result()
+                        except Exception as e:
+                            errors.append({'index': futures[future], 'error': str(e)})
+                            continue
+                        archive.writestr(filename, data)
+                        yield stream.drain()
+                    if errors:
+                        archive.writestr('errors.json', json.dumps(sorted(errors, key=lambda e: e['index'])))
+                yield stream.drain()
+
+            if output_format == 'ndjson':
+                return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+            return Response(stream_with_context(generate_zip()), mimetype='application/zip',
+                            headers={'Content-Disposition': 'attachment; filename="tech_transfer_flyers.zip"'})
+
+    collectors = _collectors(companies, job_queue, admission_control)
+
+    @app.route(metrics_path, methods=['GET'])
+    def get_metrics():
+        """Metrics of this process in the Prometheus text format"""
+        return Response(metrics.render(collectors), mimetype='text/plain; version=0.0.4')
+
+    @app.route(ready_path, methods=['GET'])
+    def readiness_check():
+        """Readiness check: 503 while the caches are being warmed up, or if that failed
+
+        A failed warm-up (say, the brand font is missing) would otherwise
+        let the instance serve flyers that are quietly wrong.
+        """
+        status = warmup.status(layout)
+        ready = status['state'] in ('cold', 'ready')
+        response = jsonify({'ready': ready, 'pid': os.getpid(), 'warmup': status,
+                            'companies': len(companies.index)})
+        if status['state'] == 'warming':
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+        elif not ready:
+            response.status_code = 503
+        return response
+
+    @app.route(health_path, methods=['GET'])
+    def health_check():
+        """Health check endpoint"""
+        return jsonify({
+            'status': 'healthy',
+            'timestamp': datetime.now().isoformat(),
+            'render_cache': render_cache.cache_info(),
+            'admission': admission_control.stats(),
+            'encoders': encoder_stats(),
+            'companies': {'version': companies.version, 'count': len(companies.index)},
+            'jobs': job_queue.stats() if job_queue else None
+        })
+
+    return app
@@ -0,0 +1,37 @@
+import os
+
+# gunicorn settings for the production backend; run from backend/:
+#     gunicorn -c gunicorn.conf.py
+# Every value can still be overridden on the command line.
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('FLYER_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('FLYER_WORKERS', str(os.cpu_count() or 1)))
+# Threads serve requests that wait on logos, uploads and render slots
+threads = int(os.environ.get('FLYER_THREADS', '4'))
+worker_class = 'gthread'
+
+# Import the app (warming its caches up) once in the master and fork the
+# workers from it, so they start ready and share that memory
+preload_app = True
+
+# Room for a request that waited for its logos and for a render slot
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Renders are CPU-bound: unless configured, the workers split the cores
+os.environ.setdefault('FLYER_MAX_CONCURRENT_RENDERS', str(max((os.cpu_count() or 1) // workers, 1)))
+
+
+def on_starting(server):
+    """Refuse to start several workers that would each keep their own jobs
+
+    A job queued on one worker could not be polled on the others.
+    """
+    from flyer import jobs
+
+    job_queue = getattr(server.app.wsgi(), 'extensions', {}).get('flyer_jobs')
+    if server.cfg.workers > 1 and job_queue and isinstance(job_queue.store, jobs.MemoryJobStore):
+        raise RuntimeError(f"{server.cfg.workers} workers cannot share in-memory jobs: "
+                           "set FLYER_JOBS_DB or run one worker")
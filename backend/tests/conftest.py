@@ -0,0 +1,61 @@
+"""Fixtures shared by the backend tests"""
+import io
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new('RGBA', (64, 64), (220, 40, 40, 255)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class LogoStub:
+    """Logo API stand-in answering GET /<domain> with a status per domain
+
+    Domains without a status get a logo; every request is counted.
+    """
+
+    def __init__(self):
+        self.statuses = {}
+        self.delay = 0
+        self.requests = Counter()
+        self.logo = _png()
+
+    def serve(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                domain = self.path.lstrip('/')
+                stub.requests[domain] += 1
+                time.sleep(stub.delay)
+                status = stub.statuses.get(domain, 200)
+                body = stub.logo if status == 200 else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+@pytest.fixture
+def logo_api():
+    """Serve a LogoStub on a local port; yields (stub, base URL)"""
+    stub = LogoStub()
+    server = stub.serve()
+    yield stub, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,163 @@
+"""Admission control tests with concurrent threads"""
+import threading
+import time
+
+import pytest
+
+from flyer.admission import AdmissionController, Overloaded
+
+
+def _hold(controller, release, entered=None):
+    """Start a thread holding a render slot until release is set"""
+    def run():
+        with controller.admit():
+            if entered:
+                entered.set()
+            release.wait()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_limits_concurrent_renders():
+    controller = AdmissionController(limit=2, queue_size=10, timeout=5)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def render():
+        with controller.admit():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+    threads = [threading.Thread(target=render) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+    stats = controller.stats()
+    assert stats['admitted'] == 8 and stats['finished'] == 8
+    assert stats['running'] == 0 and stats['waiting'] == 0
+
+
+def test_full_queue_is_refused_with_429():
+    controller = AdmissionController(limit=1, queue_size=1, timeout=5)
+    release = threading.Event()
+    entered = threading.Event()
+    holder = _hold(controller, release, entered)
+    entered.wait(2)
+    waiter = _hold(controller, release)
+    _wait_for(lambda: controller.stats()['waiting'] == 1)
+
+    with pytest.raises(Overloaded) as error:
+        with controller.admit():
+            pass
+    assert error.value.status_code == 429
+    assert error.value.retry_after >= 1
+
+    release.set()
+    holder.join()
+    waiter.join()
+    assert controller.stats()['rejected'] == 1
+    assert controller.stats()['admitted'] == 2
+
+
+def test_waiting_too_long_is_refused_with_503():
+    controller = AdmissionController(limit=1, queue_size=5, timeout=0.1)
+    release = threading.Event()
+    entered = threading.Event()
+    holder = _hold(controller, release, entered)
+    entered.wait(2)
+
+    with pytest.raises(Overloaded) as error:
+        with controller.admit():
+            pass
+    assert error.value.status_code == 503
+
+    release.set()
+    holder.join()
+    stats = controller.stats()
+    assert stats['timed_out'] == 1 and stats['waiting'] == 0 and stats['running'] == 0
+
+
+def test_slots_are_handed_over_in_arrival_order():
+    controller = AdmissionController(limit=1, queue_size=10, timeout=5)
+    release = threading.Event()
+    entered = threading.Event()
+    holder = _hold(controller, release, entered)
+    entered.wait(2)
+
+    order = []
+    waiters = []
+    for number in range(4):
+        def render(number=number):
+            with controller.admit():
+                order.append(number)
+        thread = threading.Thread(target=render)
+        thread.start()
+        waiters.append(thread)
+        _wait_for(lambda number=number: controller.stats()['waiting'] == number + 1)
+
+    release.set()
+    holder.join()
+    for thread in waiters:
+        thread.join()
+    assert order == [0, 1, 2, 3]
+
+
+def test_zero_limit_admits_everything():
+    controller = AdmissionController(limit=0)
+    with controller.admit():
+        with controller.admit():
+            pass
+    assert controller.stats()['admitted'] == 0
+
+
+def test_batch_takes_a_slot_per_flyer_up_to_the_limit():
+    controller = AdmissionController(limit=3, queue_size=10, timeout=5)
+    with controller.admit(slots=2):
+        assert controller.stats()['running'] == 2
+        with controller.admit():
+            assert controller.stats()['running'] == 3
+    with controller.admit(slots=50):
+        assert controller.stats()['running'] == 3
+    assert controller.stats()['running'] == 0
+
+
+def test_batch_waits_until_enough_slots_are_free():
+    controller = AdmissionController(limit=2, queue_size=10, timeout=5)
+    release = threading.Event()
+    entered = threading.Event()
+    holder = _hold(controller, release, entered)
+    entered.wait(2)
+
+    admitted = threading.Event()
+
+    def render_batch():
+        with controller.admit(slots=2):
+            admitted.set()
+
+    thread = threading.Thread(target=render_batch)
+    thread.start()
+    _wait_for(lambda: controller.stats()['waiting'] == 1)
+    assert not admitted.is_set()
+
+    release.set()
+    holder.join()
+    thread.join()
+    assert admitted.is_set()
+    assert controller.stats()['running'] == 0
@@ -0,0 +1,39 @@
+"""Logo atlas build tests against a local stub of the logo API"""
+import json
+import os
+
+import pytest
+
+from flyer import atlas
+
+
+def _companies(*domains):
+    return [{'name': domain, 'domain': domain} for domain in domains]
+
+
+@pytest.mark.parametrize('status', [404, 410])
+def test_missing_logo_is_recorded(logo_api, tmp_path, status):
+    stub, base_url = logo_api
+    stub.statuses['missing.test'] = status
+    assert atlas.build(_companies('found.test', 'missing.test'), base_url, str(tmp_path)) == []
+
+    with open(os.path.join(tmp_path, atlas.INDEX_FILE)) as f:
+        index = json.load(f)
+    assert [entry['domain'] for entry in index['tiles']] == ['found.test']
+    assert index['missing'] == ['missing.test']
+
+
+@pytest.mark.parametrize('status', [408, 429, 500, 503])
+def test_transient_failure_is_not_recorded_as_missing(logo_api, tmp_path, status):
+    stub, base_url = logo_api
+    stub.statuses['flaky.test'] = status
+    assert atlas.build(_companies('found.test', 'flaky.test'), base_url, str(tmp_path)) == ['flaky.test']
+    assert not os.path.exists(os.path.join(tmp_path, atlas.INDEX_FILE))
+
+    # With --partial the atlas is written, and the domain is left to the
+    # logo store instead of being cached as having no logo
+    assert atlas.build(_companies('found.test', 'flaky.test'), base_url, str(tmp_path), partial=True) == ['flaky.test']
+    with open(os.path.join(tmp_path, atlas.INDEX_FILE)) as f:
+        index = json.load(f)
+    assert index['missing'] == []
+    assert [entry['domain'] for entry in index['tiles']] == ['found.test']
@@ -0,0 +1,32 @@
+"""Batch rendering helper tests"""
+from concurrent.futures import Future
+
+from flyer import batch
+
+SPEC = {'name': 'Ada', 'former_company': 'Google', 'new_company': 'Apple', 'role': 'Engineer',
+        'announcement_text': 'Signed', 'date': '2026-01-01', 'layout': 'transfer-update'}
+
+
+def test_logo_deadline_grows_with_the_batch(monkeypatch):
+    deadlines = []
+
+    def find_logos(domain_lists, size, deadline):
+        deadlines.append(deadline)
+        return [None] * len(domain_lists)
+
+    monkeypatch.setattr(batch, 'find_logos', find_logos)
+    monkeypatch.setattr(batch, 'LOGO_WORKERS', 4)
+    assert batch.resolve_logos([SPEC]) == [(None, None)]
+    assert len(batch.resolve_logos([SPEC] * 10)) == 10
+    assert deadlines == [batch.LOGO_DEADLINE, 5 * batch.LOGO_DEADLINE]
+
+
+def test_when_done_calls_back_after_the_last_future():
+    futures = [Future() for _ in range(3)]
+    calls = []
+    batch.when_done(futures, lambda: calls.append(1))
+    futures[0].set_result(0)
+    futures[2].set_exception(ValueError())
+    assert calls == []
+    futures[1].set_result(1)
+    assert calls == [1]
@@ -0,0 +1,47 @@
+"""Company index search tests"""
+from flyer import companies
+from flyer.companies import CompanyIndex
+
+COMPANIES = [{'name': name, 'domain': f"{name.lower().replace(' ', '')}.com"} for name in (
+    'Google', 'MongoDB', 'Microsoft', 'OpenAI', 'Baidu', 'Mailchimp', 'Airbnb', 'Oracle', 'Vercel', 'Scale AI')]
+
+
+def _names(index, query, **kwargs):
+    return [company['name'] for company in index.search(query, **kwargs)[1]]
+
+
+def test_name_prefix_then_word_prefix_then_substring():
+    index = CompanyIndex(COMPANIES)
+    assert _names(index, 'ai') == ['Airbnb', 'Scale AI', 'Baidu', 'Mailchimp', 'OpenAI']
+    assert _names(index, 'go') == ['Google', 'MongoDB']
+    assert _names(index, 'soft') == ['Microsoft']
+    assert _names(index, 'O') == ['OpenAI', 'Oracle', 'Google', 'Microsoft', 'MongoDB']
+
+
+def test_page_and_total():
+    index = CompanyIndex(COMPANIES)
+    total, page = index.search('ai', offset=1, limit=2)
+    assert total == 5
+    assert [company['name'] for company in page] == ['Scale AI', 'Baidu']
+
+
+def test_fuzzy_matches_when_nothing_contains_the_query():
+    index = CompanyIndex(COMPANIES)
+    assert _names(index, 'gogle') == ['Google']
+    assert _names(index, 'oracel') == ['Oracle', 'Vercel']
+    assert _names(index, 'qzxv') == []
+
+
+def test_fuzzy_search_only_ranks_the_closest_candidates(monkeypatch):
+    index = CompanyIndex(COMPANIES + [{'name': f"Filler {i}", 'domain': f"filler{i}.com"} for i in range(1000)])
+    monkeypatch.setattr(companies, 'FUZZY_CANDIDATES', 3)
+    compared = []
+    get_close_matches = companies.difflib.get_close_matches
+
+    def counting_get_close_matches(word, possibilities, **kwargs):
+        compared.extend(possibilities)
+        return get_close_matches(word, possibilities, **kwargs)
+
+    monkeypatch.setattr(companies.difflib, 'get_close_matches', counting_get_close_matches)
+    assert _names(index, 'gogle') == ['Google']
+    assert len(compared) <= 3
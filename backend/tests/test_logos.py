@@ -0,0 +1,118 @@
+"""Logo store tests against a local stub of the logo API"""
+import os
+import threading
+import time
+
+import pytest
+
+from flyer import logos
+
+
+@pytest.fixture
+def stub(logo_api, tmp_path, monkeypatch):
+    stub, base_url = logo_api
+    monkeypatch.setattr(logos, 'LOGO_BASE_URL', base_url)
+    monkeypatch.setattr(logos, 'CACHE_DIR', str(tmp_path))
+    logos.clear_cache()
+    yield stub
+    logos.clear_cache()
+
+
+def test_logo_is_fetched_once_and_kept_on_disk(stub):
+    logo = logos.get_logo('found.test')
+    assert logo.size == (logos.LOGO_SIZE, logos.LOGO_SIZE)
+    assert logo.mode == 'RGBA'
+    assert logo.info['digest']
+    assert logos.get_logo('found.test') is logo
+
+    # A fresh process (empty memory tier) reads it back from disk
+    logos.clear_cache()
+    assert logos.get_logo('found.test').info['digest'] == logo.info['digest']
+    assert stub.requests['found.test'] == 1
+
+
+@pytest.mark.parametrize('status', [404, 410])
+def test_missing_logo_is_cached(stub, status):
+    stub.statuses['missing.test'] = status
+    assert logos.get_logo('missing.test') is None
+    assert logos.get_logo('missing.test') is None
+    logos.clear_cache()
+    assert logos.get_logo('missing.test') is None
+    assert stub.requests['missing.test'] == 1
+
+
+@pytest.mark.parametrize('status', [408, 429, 500, 503])
+def test_transient_failure_is_retried(stub, status):
+    stub.statuses['flaky.test'] = status
+    assert logos.get_logo('flaky.test') is None
+    assert logos.get_logo('flaky.test') is None
+    assert stub.requests['flaky.test'] == 2
+
+    # Once the API recovers the logo is found
+    del stub.statuses['flaky.test']
+    assert logos.get_logo('flaky.test') is not None
+
+
+def test_concurrent_lookups_share_one_fetch(stub):
+    stub.delay = 0.2
+    barrier = threading.Barrier(8)
+    results = []
+
+    def lookup():
+        barrier.wait()
+        results.append(logos.get_logo('busy.test'))
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stub.requests['busy.test'] == 1
+    assert len(results) == 8
+    assert all(logo is not None for logo in results)
+
+
+def test_find_logos_takes_first_domain_with_a_logo(stub):
+    stub.statuses['first.test'] = 404
+    former, new = logos.find_logos([['first.test', 'second.test'], ['other.test']], size=32)
+    assert former.size == (32, 32)
+    assert new is not None
+    assert stub.requests['first.test'] == 1
+    assert stub.requests['second.test'] == 1
+
+
+def test_find_logos_gives_up_at_the_deadline(stub):
+    stub.delay = 1
+    start = time.monotonic()
+    assert logos.find_logos([['slow.test']], deadline=0.2) == [None]
+    assert time.monotonic() - start < 0.9
+
+
+def test_expired_record_is_deleted_when_read(stub):
+    # The first write of a process sweeps the tier; this one is counted
+    logos._write_record('new.test', None, 100)
+    logos._write_record('old.test', None, -1)
+    path = logos._record_path('old.test')
+    assert os.path.exists(path)
+    assert logos._read_record('old.test') is None
+    assert not os.path.exists(path)
+
+
+def test_sweep_keeps_the_records_expiring_last(stub, monkeypatch):
+    monkeypatch.setattr(logos, 'DISK_RECORDS', 10)
+    monkeypatch.setattr(logos, 'DISK_LOW_WATER', 0.5)
+    monkeypatch.setattr(logos, 'BLOB_GRACE', -1)
+    assert logos.get_logo('found.test') is not None
+    orphan = logos._store_blob(b'no record points here')
+    logos._write_record('expired.test', None, -1)
+
+    # The 11th live record takes the tier past DISK_RECORDS
+    for i in range(10):
+        logos._write_record(f"domain{i}.test", None, 100 + i)
+
+    kept = {domain for domain in ['found.test', 'expired.test'] + [f"domain{i}.test" for i in range(10)]
+            if os.path.exists(logos._record_path(domain))}
+    assert kept == {'found.test'} | {f"domain{i}.test" for i in range(6, 10)}
+    assert os.path.exists(logos._blob_path(logos._read_record('found.test')['digest']))
+    assert not os.path.exists(logos._blob_path(orphan))
@@ -0,0 +1,83 @@
+"""Single-flight coalescing tests with concurrent threads"""
+import threading
+import time
+
+import pytest
+
+from flyer.singleflight import Group
+
+
+def _run_together(count, fn):
+    """Call fn() from count threads released at once; return results and errors"""
+    barrier = threading.Barrier(count)
+    results, errors = [], []
+
+    def run():
+        barrier.wait()
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    group = Group()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return object()
+
+    results, errors = _run_together(8, lambda: group.do('key', work))
+    assert not errors
+    assert len(calls) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert group.stats() == {'calls': 1, 'shared': 7, 'in_flight': 0}
+
+
+def test_waiters_share_the_exception():
+    group = Group()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError('render failed')
+
+    results, errors = _run_together(4, lambda: group.do('key', work))
+    assert not results
+    assert len(calls) == 1
+    assert len(errors) == 4 and all(isinstance(e, RuntimeError) for e in errors)
+
+
+def test_different_keys_run_separately():
+    group = Group()
+    started = threading.Barrier(2, timeout=2)
+
+    def work(key):
+        # Both calls must be running at once to get past the barrier
+        started.wait()
+        return key
+
+    results, errors = _run_together(2, lambda: group.do(threading.current_thread().name,
+                                                        lambda: work(threading.current_thread().name)))
+    assert not errors
+    assert len(set(results)) == 2
+
+
+def test_nothing_is_cached_after_the_call():
+    group = Group()
+    assert group.do('key', lambda: 1) == 1
+    assert group.do('key', lambda: 2) == 2
+    with pytest.raises(ValueError):
+        group.do('key', lambda: int('x'))
+    assert group.do('key', lambda: 3) == 3
+    assert group.stats()['in_flight'] == 0
@@ -0,0 +1,129 @@
+"""Streaming multipart parser tests"""
+import io
+
+import pytest
+from PIL import Image
+from werkzeug.wsgi import LimitedStream
+
+from flyer import uploads
+from flyer.ingest import ProfileImageError, ProfileImageTooLarge
+from flyer.uploads import UploadError, UploadTooLarge, read_flyer_upload
+
+BOUNDARY = 'flyerboundary'
+CONTENT_TYPE = f'multipart/form-data; boundary={BOUNDARY}'
+FIELDS = ('name', 'role')
+
+
+def _photo():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), (90, 120, 200)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _body(fields, image=None, filename='me.png', extra_parts=()):
+    """Encode fields, then the picture, then extra_parts as a multipart body"""
+    def field(name, value):
+        return (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+                + value.encode() + b'\r\n')
+
+    parts = [field(name, value) for name, value in fields.items()]
+    if image is not None:
+        parts.append(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="profile_image"; '
+                     f'filename="{filename}"\r\nContent-Type: image/png\r\n\r\n'.encode() + image + b'\r\n')
+    parts += [field(name, value) for name, value in extra_parts]
+    return b''.join(parts) + f'--{BOUNDARY}--\r\n'.encode()
+
+
+def _read(body, content_length='auto', **kwargs):
+    if content_length == 'auto':
+        content_length = len(body)
+    return read_flyer_upload(io.BytesIO(body), CONTENT_TYPE, content_length, FIELDS, **kwargs)
+
+
+def test_reads_fields_and_picture():
+    photo = _photo()
+    fields, image = _read(_body({'name': 'Ada', 'role': 'Engineer', 'ignored': 'x'}, photo))
+    assert fields == {'name': 'Ada', 'role': 'Engineer'}
+    assert image == photo
+
+
+def test_parts_split_across_many_chunks(monkeypatch):
+    monkeypatch.setattr(uploads, 'CHUNK_SIZE', 7)
+    photo = _photo()
+    fields, image = _read(_body({'name': 'Ada Lovelace', 'role': 'Engineer'}, photo), optional=('note',))
+    assert fields == {'name': 'Ada Lovelace', 'role': 'Engineer'}
+    # Werkzeug's decoder passes on the delimiter's CR when a chunk ends
+    # right before it; the picture is unchanged
+    assert Image.open(io.BytesIO(image)).tobytes() == Image.open(io.BytesIO(photo)).tobytes()
+
+
+def test_optional_fields_are_kept():
+    fields, _ = _read(_body({'name': 'Ada', 'role': 'R', 'callback_url': 'https://example.com'}, _photo()),
+                      optional=('callback_url',))
+    assert fields['callback_url'] == 'https://example.com'
+
+
+def test_rejects_other_content_types():
+    with pytest.raises(UploadError, match='multipart/form-data'):
+        read_flyer_upload(io.BytesIO(b'{}'), 'application/json', 2, FIELDS)
+
+
+def test_rejects_declared_length_over_the_limit():
+    body = _body({'name': 'Ada', 'role': 'R'}, _photo())
+    with pytest.raises(UploadTooLarge) as error:
+        _read(body, content_length=uploads.MAX_REQUEST_BYTES + 1)
+    assert error.value.status_code == 413
+
+
+def test_rejects_undeclared_body_over_the_limit():
+    body = _body({'name': 'Ada', 'role': 'R'}, _photo())
+    with pytest.raises(UploadTooLarge, match='Request must be at most'):
+        _read(body, content_length=None, max_request_bytes=100)
+
+
+def test_server_body_limit_is_not_reported_as_too_many_parts():
+    # A body without Content-Length read through the server's limit
+    body = _body({'name': 'Ada', 'role': 'R'}, _photo())
+    stream = LimitedStream(io.BytesIO(body), 100, is_max=True)
+    with pytest.raises(UploadTooLarge, match='Request must be at most') as error:
+        read_flyer_upload(stream, CONTENT_TYPE, None, FIELDS)
+    assert error.value.status_code == 413
+
+
+def test_rejects_too_many_parts():
+    extra = [(f'extra{i}', 'x') for i in range(uploads.MAX_PARTS + 1)]
+    with pytest.raises(UploadTooLarge, match='form parts'):
+        _read(_body({'name': 'Ada', 'role': 'R'}, extra_parts=extra))
+
+
+def test_rejects_long_fields():
+    with pytest.raises(UploadTooLarge, match='name must be at most'):
+        _read(_body({'name': 'A' * (uploads.MAX_FIELD_BYTES + 1), 'role': 'R'}, _photo()))
+
+
+def test_fields_must_precede_the_picture():
+    with pytest.raises(UploadError, match='missing: role'):
+        _read(_body({'name': 'Ada'}, _photo(), extra_parts=[('role', 'R')]))
+
+
+def test_missing_picture():
+    with pytest.raises(UploadError, match='profile_image'):
+        _read(_body({'name': 'Ada', 'role': 'R'}))
+
+
+def test_rejects_files_that_are_not_images():
+    with pytest.raises(ProfileImageError, match='valid image'):
+        _read(_body({'name': 'Ada', 'role': 'R'}, b'this is not an image at all'))
+
+
+def test_rejects_pictures_over_the_byte_limit(monkeypatch):
+    photo = _photo()
+    monkeypatch.setattr(uploads, 'MAX_BYTES', len(photo) - 1)
+    with pytest.raises(ProfileImageTooLarge):
+        _read(_body({'name': 'Ada', 'role': 'R'}, photo))
+
+
+def test_truncated_body_is_malformed():
+    body = _body({'name': 'Ada', 'role': 'R'}, _photo())
+    with pytest.raises(UploadError, match='Malformed'):
+        _read(body[:len(body) // 2])
@@ -0,0 +1,54 @@
+"""Flask API tests for conditional flyer requests"""
+import io
+
+import pytest
+from PIL import Image
+
+from flyer import artifacts, logos, render_cache
+from flyer.web import create_app
+
+
+@pytest.fixture
+def client(logo_api, tmp_path, monkeypatch):
+    _, base_url = logo_api
+    monkeypatch.setattr(logos, 'LOGO_BASE_URL', base_url)
+    monkeypatch.setattr(logos, 'CACHE_DIR', str(tmp_path / 'logos'))
+    monkeypatch.setattr(render_cache, 'CACHE_DIR', str(tmp_path / 'renders'))
+    monkeypatch.setattr(artifacts, 'ROOT', str(tmp_path / 'artifacts'))
+    logos.clear_cache()
+    app = create_app(layout='transfer-update', enable_batch=False, enable_jobs=False)
+    yield app.test_client()
+    logos.clear_cache()
+
+
+def _form():
+    picture = io.BytesIO()
+    Image.new('RGB', (64, 64), (30, 90, 200)).save(picture, 'JPEG')
+    picture.seek(0)
+    return {'name': 'Ada Lovelace', 'former_company': 'Google', 'new_company': 'Apple', 'role': 'Engineer',
+            'announcement_text': 'Signed', 'date': '2026-01-01', 'profile_image': (picture, 'ada.jpg')}
+
+
+def test_post_matching_if_none_match_is_refused_with_412(client):
+    response = client.post('/api/generate-flyer?format=png', data=_form())
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    again = client.post('/api/generate-flyer?format=png', data=_form(), headers={'If-None-Match': etag})
+    assert again.status_code == 412
+    assert again.headers['ETag'] == etag
+    assert again.mimetype == 'application/json'
+
+    other = client.post('/api/generate-flyer?format=png', data=_form(), headers={'If-None-Match': '"other"'})
+    assert other.status_code == 200
+
+
+def test_get_matching_if_none_match_is_not_modified(client):
+    created = client.post('/api/generate-flyer?format=png', data=_form())
+    url = f"/api/flyers/{created.headers['X-Flyer-Id']}"
+    response = client.get(url)
+    assert response.status_code == 200
+    response.close()
+
+    again = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
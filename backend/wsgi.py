@@ -0,0 +1,20 @@
+import gc
+
+from flyer import jobs
+from flyer.web import create_app
+
+# Production entry point for the "TRANSFER UPDATE" backend (app.py is the
+# development server). gunicorn (gunicorn.conf.py) and uWSGI (uwsgi.ini)
+# import this module once in their master process and fork the workers from
+# it, so the company index and the warmed-up fonts, layers, masks and logo
+# atlas are loaded once and shared by every worker copy-on-write.
+#
+# A job is polled with GET /api/jobs/<id>, which any worker may answer, so
+# async mode is only offered when the jobs are kept in a store every worker
+# reads (FLYER_JOBS_DB).
+app = create_app(layout='transfer-update', health_path='/health', prewarm=True, enable_jobs=bool(jobs.JOBS_DB))
+
+# Everything loaded so far lives as long as the process. Freezing it keeps
+# the garbage collector in the workers from writing to, and so copying, the
+# pages they share with the master.
+gc.freeze()
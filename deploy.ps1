@@ -92,13 +92,20 @@ if (-not (Test-Path "frontend/package.json")) {
 
 Print-Status "frontend/package.json found"
 
-# Check if companies.json exists in api directory
-if (-not (Test-Path "api/companies.json")) {
-    Print-Error "api/companies.json not found"
+# Check if companies.json exists in backend directory
+if (-not (Test-Path "backend/companies.json")) {
+    Print-Error "backend/companies.json not found"
     exit 1
 }
 
-Print-Status "api/companies.json found"
+Print-Status "backend/companies.json found"
+
+# Check that the bundled fonts are in the checkout
+foreach ($font in @("LilitaOne-Regular.ttf")) {
+    if (-not (Test-Path "backend/flyer/assets/fonts/$font")) {
+        Print-Warning "backend/flyer/assets/fonts/$font not found (run 'python -m flyer.fonts vendor' in backend/); flyers will use fallback fonts"
+    }
+}
 
 Write-Host ""
 Write-Host "🔧 Installing dependencies..." -ForegroundColor Cyan
@@ -89,13 +89,20 @@ fi
 
 print_status "frontend/package.json found"
 
-# Check if companies.json exists in api directory
-if [ ! -f "api/companies.json" ]; then
-    print_error "api/companies.json not found"
+# Check if companies.json exists in backend directory
+if [ ! -f "backend/companies.json" ]; then
+    print_error "backend/companies.json not found"
     exit 1
 fi
 
-print_status "api/companies.json found"
+print_status "backend/companies.json found"
+
+# Check that the bundled fonts are in the checkout
+for font in LilitaOne-Regular.ttf; do
+    if [ ! -f "backend/flyer/assets/fonts/$font" ]; then
+        print_warning "backend/flyer/assets/fonts/$font not found (run 'python -m flyer.fonts vendor' in backend/); flyers will use fallback fonts"
+    fi
+done
 
 echo ""
 echo "🔧 Installing dependencies..."
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react'
 import axios from 'axios'
 import { Upload, Download, Sparkles, ArrowRight, User, Building, Briefcase, Coffee, Heart } from 'lucide-react'
 import CompanySelector from './CompanySelector'
+import CompanyLogo from './CompanyLogo'
 
 function App() {
   const [companies, setCompanies] = useState([])
@@ -79,16 +80,36 @@ function App() {
       formDataToSend.append('date', new Date().toISOString().split('T')[0]) // Auto-generate current date
       formDataToSend.append('profile_image', formData.profile_image)
 
+      // Ask for the raw PNG instead of base64 in JSON
       const response = await axios.post('/api/generate-flyer', formDataToSend, {
         headers: {
-          'Content-Type': 'multipart/form-data'
-        }
+          'Content-Type': 'multipart/form-data',
+          'Accept': 'image/png'
+        },
+        responseType: 'blob'
       })
 
-      setGeneratedImage(response.data)
+      const disposition = response.headers['content-disposition'] || ''
+      const filename = disposition.match(/filename="?([^";]+)"?/)?.[1] || 'tech_transfer.png'
+      if (generatedImage) {
+        URL.revokeObjectURL(generatedImage.url)
+      }
+      setGeneratedImage({
+        url: URL.createObjectURL(response.data),
+        filename
+      })
     } catch (err) {
       console.error('Error generating flyer:', err)
-      setError(err.response?.data?.error || 'Failed to generate flyer')
+      // Errors still come back as JSON, wrapped in a Blob
+      let message = 'Failed to generate flyer'
+      if (err.response?.data instanceof Blob) {
+        try {
+          message = JSON.parse(await err.response.data.text()).error || message
+        } catch (parseError) {
+          // Keep the generic message
+        }
+      }
+      setError(message)
     } finally {
       setIsLoading(false)
     }
@@ -97,7 +118,7 @@ function App() {
   const downloadImage = () => {
     if (generatedImage) {
       const link = document.createElement('a')
-      link.href = `data:image/png;base64,${generatedImage.image_data}`
+      link.href = generatedImage.url
       link.download = generatedImage.filename
       link.click()
     }
@@ -114,6 +135,9 @@ function App() {
       profile_image: null
     })
     setPreview(null)
+    if (generatedImage) {
+      URL.revokeObjectURL(generatedImage.url)
+    }
     setGeneratedImage(null)
     setError('')
   }
@@ -310,7 +334,7 @@ function App() {
               <div className="space-y-4">
                 <div className="bg-white/10 rounded-lg p-4">
                   <img
-                    src={`data:image/png;base64,${generatedImage.image_data}`}
+                    src={generatedImage.url}
                     alt="Generated flyer"
                     className="w-full h-auto rounded-lg shadow-lg"
                   />
@@ -346,12 +370,7 @@ function App() {
                     <div className="flex items-center justify-center gap-2 mt-2">
                       <div className="flex items-center gap-1">
                         {companies.find(c => c.name === formData.former_company) ? (
-                          <img
-                            src={companies.find(c => c.name === formData.former_company)?.logo}
-                            alt={formData.former_company}
-                            className="w-8 h-8 object-contain"
-                            onError={(e) => { e.target.style.display = 'none' }}
-                          />
+                          <CompanyLogo company={companies.find(c => c.name === formData.former_company)} size={32} />
                         ) : (
                           <div className="w-8 h-8 bg-white/30 rounded flex items-center justify-center">
                             <span className="text-xs">?</span>
@@ -362,12 +381,7 @@ function App() {
                       <ArrowRight className="w-4 h-4 text-black" />
                       <div className="flex items-center gap-1">
                         {companies.find(c => c.name === formData.new_company) ? (
-                          <img
-                            src={companies.find(c => c.name === formData.new_company)?.logo}
-                            alt={formData.new_company}
-                            className="w-8 h-8  object-contain"
-                            onError={(e) => { e.target.style.display = 'none' }}
-                          />
+                          <CompanyLogo company={companies.find(c => c.name === formData.new_company)} size={32} />
                         ) : (
                           <div className="w-8 h-8  bg-white/30 rounded flex items-center justify-center">
                             <span className="text-xs">?</span>
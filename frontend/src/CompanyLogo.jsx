@@ -0,0 +1,38 @@
+import React from 'react'
+
+// Company logo drawn from the shared sprite sheet when the company is in the
+// logo atlas, so the whole dropdown costs one image request; other companies
+// fall back to their own logo URL
+const CompanyLogo = ({ company, size, className = '' }) => {
+  const sprite = company.sprite
+  if (!sprite) {
+    return (
+      <img
+        src={company.logo}
+        alt={company.name}
+        className={`object-contain ${className}`}
+        style={{ width: size, height: size }}
+        onError={(e) => { e.target.style.display = 'none' }}
+      />
+    )
+  }
+
+  const scale = size / sprite.size
+  return (
+    <div
+      role="img"
+      aria-label={company.name}
+      className={className}
+      style={{
+        width: size,
+        height: size,
+        backgroundImage: `url(${sprite.url})`,
+        backgroundSize: `${sprite.width * scale}px ${sprite.height * scale}px`,
+        backgroundPosition: `-${sprite.x * scale}px -${sprite.y * scale}px`,
+        backgroundRepeat: 'no-repeat',
+      }}
+    />
+  )
+}
+
+export default CompanyLogo
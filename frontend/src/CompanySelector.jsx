@@ -1,16 +1,50 @@
 import React, { useState, useRef, useEffect } from 'react'
+import axios from 'axios'
 import { ChevronDown, Search } from 'lucide-react'
+import CompanyLogo from './CompanyLogo'
+
+// Maximum number of companies rendered in the dropdown at once
+const MAX_RESULTS = 50
 
 const CompanySelector = ({ companies, value, onChange, placeholder, name }) => {
   const [isOpen, setIsOpen] = useState(false)
   const [searchTerm, setSearchTerm] = useState('')
+  const [searchResults, setSearchResults] = useState(null)
   const [showCustomInput, setShowCustomInput] = useState(false)
   const [customCompanyName, setCustomCompanyName] = useState('')
   const dropdownRef = useRef(null)
 
-  const filteredCompanies = companies.filter(company =>
-    company.name.toLowerCase().includes(searchTerm.toLowerCase())
-  )
+  // Search on the server while typing; filter locally until results arrive
+  useEffect(() => {
+    const query = searchTerm.trim()
+    if (!query) {
+      setSearchResults(null)
+      return
+    }
+    let cancelled = false
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get('/api/companies', { params: { q: query, limit: MAX_RESULTS } })
+        if (!cancelled) {
+          setSearchResults({ query, companies: response.data.companies })
+        }
+      } catch (err) {
+        console.error('Error searching companies:', err)
+      }
+    }, 150)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [searchTerm])
+
+  const filteredCompanies = (
+    searchResults && searchResults.query === searchTerm.trim()
+      ? searchResults.companies
+      : companies.filter(company =>
+          company.name.toLowerCase().includes(searchTerm.toLowerCase())
+        )
+  ).slice(0, MAX_RESULTS)
 
   const selectedCompany = companies.find(c => c.name === value)
   const isCustomCompany = value && !selectedCompany
@@ -122,12 +156,7 @@ const CompanySelector = ({ companies, value, onChange, placeholder, name }) => {
             <div className="flex items-center gap-2">
               {selectedCompany ? (
                 <>
-                  <img
-                    src={selectedCompany.logo}
-                    alt={selectedCompany.name}
-                    className="w-5 h-5 object-contain"
-                    onError={(e) => { e.target.style.display = 'none' }}
-                  />
+                  <CompanyLogo company={selectedCompany} size={20} />
                   <span className="text-gray-900">{selectedCompany.name}</span>
                 </>
               ) : isCustomCompany ? (
@@ -174,12 +203,7 @@ const CompanySelector = ({ companies, value, onChange, placeholder, name }) => {
                     onClick={() => handleSelect(company)}
                     className="w-full px-4 py-3 flex items-center gap-3 hover:bg-gray-50 transition-colors text-left"
                   >
-                    <img
-                      src={company.logo}
-                      alt={company.name}
-                      className="w-6 h-6 object-contain flex-shrink-0"
-                      onError={(e) => { e.target.style.display = 'none' }}
-                    />
+                    <CompanyLogo company={company} size={24} className="flex-shrink-0" />
                     <span className="text-gray-900 font-medium">{company.name}</span>
                   </button>
                 ))}